@@ -0,0 +1,125 @@
+import functools
+import inspect
+import json
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List
+
+from armazenamento import CLIENTE_PADRAO
+from historico import GerenciadorHistorico, para_python
+from instrumentacao import REGISTRO, medir, registrar
+
+# Ferramentas que só leem a carteira/catálogo: podem rodar em paralelo.
+# As demais alteram a carteira e rodam em série, uma por vez por cliente.
+FERRAMENTAS_LEITURA = frozenset({"consultar_carteira", "obter_perfil_investidor", "sugerir_investimentos",
+                                 "iniciar_questionario_perfil", "avaliar_carteira"})
+RESPOSTA_VAZIA = "Não obtive uma resposta válida. Por favor, tente novamente."
+RESPOSTA_INTERROMPIDA = "Desculpe, não consegui concluir a resposta agora. Por favor, tente novamente."
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ferramentas")
+_TRAVAS_CLIENTE: Dict[str, threading.Lock] = {}
+_TRAVA_TRAVAS = threading.Lock()
+
+
+def _trava_cliente(cliente_id: str) -> threading.Lock:
+    with _TRAVA_TRAVAS: return _TRAVAS_CLIENTE.setdefault(cliente_id, threading.Lock())
+
+
+@functools.lru_cache(maxsize=None)
+def _recebe_cliente(funcao: Callable[..., str]) -> bool:
+    return "cliente_id" in inspect.signature(funcao).parameters
+
+
+def _chamar(funcoes: Dict[str, Callable[..., str]], chamada, cliente_id: str = CLIENTE_PADRAO) -> str:
+    """Chama a ferramenta com os argumentos do modelo; o cliente é sempre o do turno, nunca um cliente_id vindo do modelo."""
+    funcao = funcoes.get(chamada.name)
+    if funcao is None: return json.dumps({"status": "erro", "mensagem": f"Função '{chamada.name}' não disponível."})
+    argumentos = dict(para_python(chamada.args) or {})
+    argumentos.pop("cliente_id", None)
+    if _recebe_cliente(funcao): argumentos["cliente_id"] = cliente_id
+    try: return funcao(**argumentos)
+    except Exception as e:  # o modelo precisa de uma resposta para cada function_call, mesmo quando a ferramenta falha
+        traceback.print_exc()
+        return json.dumps({"status": "erro", "mensagem": f"Erro ao executar '{chamada.name}': {e}"}, ensure_ascii=False)
+
+
+def executar_chamadas(chamadas: List[Any], funcoes: Dict[str, Callable[..., str]], cliente_id: str = CLIENTE_PADRAO) -> List[str]:
+    """
+    Executa as chamadas de função de uma resposta, mantendo a ordem dos resultados.
+    Chamadas de leitura consecutivas rodam juntas no pool de threads; uma chamada
+    que altera a carteira espera as anteriores e roda sob a trava do cliente.
+    """
+    resultados: List[str] = [""] * len(chamadas)
+    pendentes = []
+    for i, chamada in enumerate(chamadas):
+        if chamada.name in FERRAMENTAS_LEITURA:
+            pendentes.append((i, _EXECUTOR.submit(_chamar, funcoes, chamada, cliente_id)))
+            continue
+        for j, futuro in pendentes: resultados[j] = futuro.result()
+        pendentes = []
+        with _trava_cliente(cliente_id): resultados[i] = _chamar(funcoes, chamada, cliente_id)
+    for j, futuro in pendentes: resultados[j] = futuro.result()
+    return resultados
+
+
+def _partes(resposta) -> List[Any]:
+    if not resposta.candidates or not resposta.candidates[0].content: return []
+    return list(resposta.candidates[0].content.parts)
+
+
+def _descartar_resposta(chat, anterior: List[Any], respostas_funcao: List[Any] = None):
+    """
+    Volta o histórico ao ponto anterior à resposta que falhou: com stream, um
+    bloqueio (SAFETY, RECITATION) ou erro no meio da resposta deixa o ChatSession
+    do genai quebrado, e todo acesso a chat.history passa a levantar exceção.
+    Se a mensagem perdida eram resultados de ferramentas, eles continuam no
+    histórico, fechando as function_calls com uma resposta de erro do modelo.
+    """
+    if respostas_funcao: anterior = anterior + [{"role": "user", "parts": respostas_funcao},
+                                                {"role": "model", "parts": [{"text": RESPOSTA_INTERROMPIDA}]}]
+    chat.history = anterior
+
+
+def executar_turno(chat, conteudo: List[Any], funcoes: Dict[str, Callable[..., str]], cliente_id: str = CLIENTE_PADRAO,
+                   historico: GerenciadorHistorico = None) -> Iterator[str]:
+    """
+    Roda um turno do agente e gera o texto da resposta à medida que chega do modelo.
+    Todas as chamadas de função de uma resposta são executadas (as de leitura em
+    paralelo) e os resultados voltam ao modelo em uma única mensagem. Com um
+    GerenciadorHistorico, o histórico é compactado antes do turno começar. Se a
+    resposta do modelo falhar, o turno termina com RESPOSTA_INTERROMPIDA e o
+    histórico volta a um estado válido.
+    """
+    with REGISTRO.turno():
+        if historico is not None:
+            with medir("historico.compactar"): historico.compactar(chat, conteudo)
+        mensagem = conteudo
+        houve_texto = False
+        while True:
+            # Ida e volta ao modelo: até o primeiro trecho e até o fim do stream (inclui o consumo pelo chamador)
+            inicio = time.perf_counter()
+            anterior = list(chat.history)
+            chamadas, primeiro = [], True
+            try:
+                for trecho in chat.send_message(mensagem, stream=True):
+                    if primeiro:
+                        registrar("modelo.primeiro_trecho", time.perf_counter() - inicio)
+                        primeiro = False
+                    for parte in _partes(trecho):
+                        if getattr(parte, "function_call", None) and parte.function_call.name: chamadas.append(parte.function_call)
+                        elif getattr(parte, "text", ""):
+                            houve_texto = True
+                            yield parte.text
+                chat.history  # com stream, o genai só confere o motivo de término (SAFETY, RECITATION...) ao montar o histórico
+            except Exception:
+                traceback.print_exc()
+                _descartar_resposta(chat, anterior, None if mensagem is conteudo else mensagem)
+                yield RESPOSTA_INTERROMPIDA
+                return
+            registrar("modelo.resposta", time.perf_counter() - inicio)
+            if not chamadas: break
+            with medir("agente.ferramentas"): resultados = executar_chamadas(chamadas, funcoes, cliente_id)
+            mensagem = [{"function_response": {"name": c.name, "response": {"result": r}}} for c, r in zip(chamadas, resultados)]
+        if not houve_texto: yield RESPOSTA_VAZIA
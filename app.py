@@ -1,9 +1,11 @@
 import streamlit as st
-import google.generativeai as genai
-import json
-import os
 from dotenv import load_dotenv
+import os
+import time
 import traceback
+import uuid
+
+inicio_execucao = time.perf_counter()
 
 st.markdown("""
     <style>
@@ -31,125 +33,75 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-import simulador_carteira
-
 # --- 1. CONFIGURAÇÃO INICIAL ---
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+load_dotenv()  # antes do simulador, que lê CARTEIRA_BACKEND ao ser importado
+from armazenamento import CLIENTE_PADRAO
+from audio import ProcessadorAudio, apagar_arquivo_gemini, criar_transcritor_gemini, enviar_arquivo_gemini
+from historico import GerenciadorHistorico
+from instrumentacao import REGISTRO, medir
+from servico_agente import ClienteServico, ServicoOcupado
 
 st.set_page_config(page_title="BTG Pactual - Agente Multimodal", layout="wide")
 st.title("🤖 Agente de Investimentos BTG")
 st.caption("Converse para consultar sua carteira ou realizar um investimento.")
 
 # --- 2. DEFINIÇÃO DAS FERRAMENTAS ---
-funcoes_disponiveis = {
-    "consultar_carteira": simulador_carteira.consultar_carteira,
-    "comprar_ativo": simulador_carteira.comprar_ativo,
-    "vender_ativo": simulador_carteira.vender_ativo,
-    "obter_perfil_investidor": simulador_carteira.obter_perfil_investidor,
-    "iniciar_questionario_perfil": simulador_carteira.iniciar_questionario_perfil,
-    "responder_questionario_perfil": simulador_carteira.responder_questionario_perfil,
-    "sugerir_investimentos": simulador_carteira.sugerir_investimentos,
-}
-ferramentas_para_ia = [
-    { "function_declarations": [
-        { "name": "consultar_carteira", "description": "Obtém a carteira de investimentos e o saldo em conta do cliente." },
-        { "name": "comprar_ativo", "description": "Executa a compra de um ativo financeiro.", "parameters": { "type": "object", "properties": {"ticker": {"type": "string"}, "valor": {"type": "number"}, "quantidade": {"type": "number"}}, "required": ["ticker"] }},
-        { "name": "vender_ativo", "description": "Executa a venda ou resgate de um ativo financeiro.", "parameters": { "type": "object", "properties": {"ticker": {"type": "string"}, "valor": {"type": "number"}, "quantidade": {"type": "number"}}, "required": ["ticker"] }},
-        { "name": "obter_perfil_investidor", "description": "Verifica o perfil de investidor (suitability) do cliente." },
-        { "name": "iniciar_questionario_perfil", "description": "Apresenta as perguntas para definir o perfil de investidor." },
-        { "name": "responder_questionario_perfil", "description": "Envia as 3 respostas do cliente (A, B ou C) para calcular e definir o perfil.", "parameters": { "type": "object", "properties": {"resposta_1": {"type": "string"}, "resposta_2": {"type": "string"}, "resposta_3": {"type": "string"}}, "required": ["resposta_1", "resposta_2", "resposta_3"] }},
-        { "name": "sugerir_investimentos", "description": "Pede uma lista de investimentos adequados ao perfil do cliente." }
-    ]}
-]
+# Com SERVICO_AGENTE=host:porta o app é só um cliente fino: os turnos rodam no
+# pool de processos de servico_agente.py, que mantém o chat de cada sessão, e o
+# app não importa o agente, as ferramentas nem o simulador de carteira.
+SERVICO_AGENTE = os.getenv("SERVICO_AGENTE")
+if not SERVICO_AGENTE:
+    # Declarações e prompt vivem em ferramentas.py; o modelo é criado uma vez por processo.
+    import agente
+    import ferramentas
+    funcoes_disponiveis = ferramentas.funcoes_disponiveis
+
+@st.cache_resource
+def obter_modelo():
+    return ferramentas.criar_modelo()
+
+@st.cache_resource
+def obter_processador_audio():
+    return ProcessadorAudio(criar_transcritor_gemini(), enviar_arquivo=enviar_arquivo_gemini, apagar_arquivo=apagar_arquivo_gemini)
 
 # --- 3. GERENCIAMENTO DA CONVERSA ---
-# SEU PROMPT DE SISTEMA ORIGINAL, 100% PRESERVADO
-PROMPT_SISTEMA = f"""Você é um assistente virtual do banco BTG Pactual. Profissional, eficiente e seguro.
-Sua principal função é ajudar clientes a consultar suas carteiras e a realizar investimentos de forma transacional e personalizada.
-
-REGRAS DE FLUXO DE CONVERSA:
-1.  **SAUDAÇÃO E INTENÇÃO**: Se o cliente quer 'investir', 'ver opções' ou similar, sua PRIMEIRA ação deve ser chamar a função `obter_perfil_investidor`.
-2.  **FLUXO DE PERFIL (SUITABILITY)**:
-    a.  Se `obter_perfil_investidor` retornar um perfil existente, informe o cliente ("Vi aqui que seu perfil é [Perfil].") e chame `sugerir_investimentos`.
-    b.  Se retornar 'perfil_nao_definido', você DEVE iniciar o questionário. Diga: "Para te ajudar melhor, primeiro precisamos definir seu perfil de investidor. São apenas 3 perguntas rápidas." e em seguida chame `iniciar_questionario_perfil`.
-    c.  Ao receber as perguntas da função, apresente-as TODAS de uma vez para o cliente, de forma clara e numerada, e bem formatada com as alternativas embaixo de cada questão. Instrua o cliente a responder com o número da pergunta e a letra da opção (ex: 'Minhas respostas são 1A, 2B e 3C').
-    d.  Ao receber as 3 respostas, chame a função `responder_questionario_perfil` com os argumentos `resposta_1`, `resposta_2` e `resposta_3`.
-    e.  Após sucesso, informe o novo perfil e chame `sugerir_investimentos`.
-3.  **RECOMENDAÇÃO DE PRODUTOS**:
-    a.  Para saber quais produtos oferecer, SEMPRE use a função `sugerir_investimentos`. Esta é sua única fonte de verdade sobre produtos disponíveis para o perfil do cliente.
-    b.  Ao apresentar as sugestões, mostre o ticker, a descrição e explique por que é adequado.
-4.  **TRANSAÇÕES (COMPRA/VENDA)**:
-    a.  Para Renda Fixa, Fundos e criptomoedas, a operação é por `valor`.
-    b.  Para Renda Variável (ações), a operação é por `quantidade`. Se o cliente fornecer um valor, ajude-o a calcular a quantidade de ações com base no preço retornado pela função de sugestão.
-    c.  Sempre confirme a operação (ativo, valor/quantidade) antes de chamar `comprar_ativo` ou `vender_ativo`.
-
-REGRAS GERAIS:
--   **PROIBIDO**: Nunca invente um ticker ou produto. Se o cliente pedir algo que não foi retornado por `sugerir_investimentos`, informe que o produto não está disponível para o perfil dele.
--   Não venda mais de um ativo por vez.
-"""
-model = genai.GenerativeModel(
-    model_name="models/gemini-flash-latest",
-    system_instruction=PROMPT_SISTEMA,
-    tools=ferramentas_para_ia
-)
-if 'chat' not in st.session_state: st.session_state.chat = model.start_chat(history=[])
+if SERVICO_AGENTE:
+    if 'sessao_id' not in st.session_state: st.session_state.sessao_id = uuid.uuid4().hex
+elif 'chat' not in st.session_state: st.session_state.chat = obter_modelo().start_chat(history=[])
 if 'processed_id' not in st.session_state: st.session_state.processed_id = None
+if 'historico' not in st.session_state: st.session_state.historico = GerenciadorHistorico()
+# Mensagens já exibidas, guardadas prontas para desenhar: o histórico enviado ao modelo é compactado
+if 'mensagens' not in st.session_state: st.session_state.mensagens = []
+MENSAGENS_VISIVEIS = 40
 
 # --- 4. LÓGICA PRINCIPAL DO AGENTE (VERSÃO FINAL E MAIS ROBUSTA) ---
-def executar_agente(prompt_usuario: str, audio_bytes: bytes = None, audio_mime_type: str = None):
+def executar_agente(prompt_usuario: str):
+    """Gera a resposta do agente em trechos, para ser exibida com st.write_stream."""
     try:
         content_to_send = [prompt_usuario]
-        if audio_bytes and audio_mime_type:
-            audio_part = {"mime_type": audio_mime_type, "data": audio_bytes}
-            content_to_send.append(audio_part)
-        
-        response = st.session_state.chat.send_message(content_to_send)
-        
-        while True:
-            # Verificação de segurança para respostas vazias ou bloqueadas
-            if not response.candidates or not response.candidates[0].content or not response.candidates[0].content.parts:
-                return "Não obtive uma resposta válida. Por favor, tente novamente."
-
-            part = response.candidates[0].content.parts[0]
-            
-            # Se não houver mais chamadas de função, o loop termina
-            if not hasattr(part, 'function_call') or not part.function_call.name:
-                break 
-
-            function_call = part.function_call
-            function_name = function_call.name
-            args_dict = {key: value for key, value in function_call.args.items()}
-            
-            function_to_call = funcoes_disponiveis[function_name]
-            function_response_str = function_to_call(**args_dict)
-            
-            response = st.session_state.chat.send_message(
-                genai.protos.Part(
-                    function_response=genai.protos.FunctionResponse(
-                        name=function_name,
-                        response={"result": function_response_str}
-                    )
-                ), 
-                stream=False
-            )
-        return response.text
+        if SERVICO_AGENTE: yield from ClienteServico(SERVICO_AGENTE).enviar(st.session_state.sessao_id, CLIENTE_PADRAO, content_to_send)
+        else: yield from agente.executar_turno(st.session_state.chat, content_to_send, funcoes_disponiveis, historico=st.session_state.historico)
+    except ServicoOcupado:
+        yield "O serviço está ocupado no momento. Aguarde alguns segundos e envie a mensagem novamente."
     except Exception as e:
         st.error("Ocorreu um erro inesperado. Por favor, tente novamente.")
         print("--- ERRO DETALHADO NO TERMINAL ---")
         traceback.print_exc()
         print("--- FIM DO ERRO ---")
-        return "Desculpe, não consegui processar sua solicitação no momento."
+        yield "Desculpe, não consegui processar sua solicitação no momento."
 
 # --- 5. INTERFACE GRÁFICA ---
-for message in st.session_state.chat.history:
-    role = "assistant" if message.role == "model" else "user"
-    if any(part.text for part in message.parts):
-         with st.chat_message(role):
-            if message.parts[0].text and "Execute o comando de voz do cliente" not in message.parts[0].text:
-                st.markdown(message.parts[0].text)
-            else:
-                st.markdown("🎤 _Comando de voz enviado_")
+mensagens = st.session_state.mensagens
+inicio_visivel = 0 if st.session_state.get("mostrar_todas") else max(0, len(mensagens) - MENSAGENS_VISIVEIS)
+if inicio_visivel and st.button(f"Mostrar {inicio_visivel} mensagens anteriores"):
+    st.session_state.mostrar_todas = True
+    st.rerun()
+with medir("streamlit.mensagens"):
+    for role, texto in mensagens[inicio_visivel:]:
+        with st.chat_message(role): st.markdown(texto)
+
+if st.session_state.historico.tamanhos:
+    st.sidebar.caption(f"Tamanho da última requisição ao modelo: {st.session_state.historico.tamanhos[-1] / 1024:.1f} KB")
 
 st.markdown("---")
 prompt_usuario = st.chat_input("Qual operação deseja realizar?")
@@ -159,22 +111,46 @@ uploaded_audio_file = st.file_uploader(
 )
 
 if uploaded_audio_file is not None and uploaded_audio_file.file_id != st.session_state.processed_id:
-    audio_bytes = uploaded_audio_file.getvalue()
-    audio_mime_type = uploaded_audio_file.type
-    prompt_contexto_audio = "Execute o comando de voz do cliente a seguir usando as ferramentas disponíveis."
-    with st.chat_message("user"): st.markdown("🎤 _Comando de voz enviado_")
-    with st.chat_message("assistant"):
+    # O áudio é transcrito uma vez (com cache pelo conteúdo): um comando repetido reaproveita a transcrição e vai direto ao agente
+    st.session_state.processed_id = uploaded_audio_file.file_id  # antes de transcrever: uma falha não se repete a cada rerun
+    try:
         with st.spinner("Processando comando de voz..."):
-            resposta_ia = executar_agente(prompt_contexto_audio, audio_bytes=audio_bytes, audio_mime_type=audio_mime_type)
-            st.markdown(resposta_ia)
-            st.session_state.processed_id = uploaded_audio_file.file_id
-            st.rerun()
+            comando = obter_processador_audio().processar(uploaded_audio_file, uploaded_audio_file.type)
+    except Exception:
+        st.error("Ocorreu um erro inesperado. Por favor, tente novamente.")
+        print("--- ERRO DETALHADO NO TERMINAL ---")
+        traceback.print_exc()
+        print("--- FIM DO ERRO ---")
+        comando = None
+    transcricao = comando.transcricao if comando else ""
+    texto_usuario = f"🎤 _{transcricao or 'Comando de voz enviado'}_"
+    with st.chat_message("user"): st.markdown(texto_usuario)
+    with st.chat_message("assistant"):
+        if comando is None: resposta_ia = "Desculpe, não consegui processar o áudio no momento. Pode enviar novamente ou digitar o comando?"
+        elif not transcricao: resposta_ia = "Não consegui entender o áudio. Pode enviar novamente ou digitar o comando?"
+        else: resposta_ia = None
+        if resposta_ia: st.markdown(resposta_ia)
+        else:
+            prompt_contexto_audio = "Execute o comando de voz do cliente a seguir usando as ferramentas disponíveis."
+            with medir("streamlit.resposta"): resposta_ia = st.write_stream(executar_agente(f"{prompt_contexto_audio}\n\nComando de voz (transcrito): {comando.transcricao}"))
+    mensagens.extend([("user", texto_usuario), ("assistant", resposta_ia)])
 
 elif prompt_usuario and prompt_usuario != st.session_state.processed_id:
     with st.chat_message("user"): st.markdown(prompt_usuario)
     with st.chat_message("assistant"):
         with st.spinner("Processando..."):
-            resposta_ia = executar_agente(prompt_usuario)
-            st.markdown(resposta_ia)
+            with medir("streamlit.resposta"): resposta_ia = st.write_stream(executar_agente(prompt_usuario))
             st.session_state.processed_id = prompt_usuario
-            st.rerun()
\ No newline at end of file
+    mensagens.extend([("user", prompt_usuario), ("assistant", resposta_ia)])
+
+# --- 6. DIAGNÓSTICO (INSTRUMENTACAO_PAINEL=1) ---
+REGISTRO.registrar("streamlit.execucao", time.perf_counter() - inicio_execucao)
+if os.getenv("INSTRUMENTACAO_PAINEL") == "1":
+    with st.sidebar.expander("Diagnóstico de latência"):
+        resumo = REGISTRO.resumo()
+        st.dataframe([{"etapa": etapa, **valores} for etapa, valores in resumo.items()], hide_index=True)
+        st.download_button("Exportar (Prometheus)", REGISTRO.prometheus(), file_name="metricas.prom")
+        st.download_button("Exportar (JSON)", REGISTRO.exportar_json(), file_name="metricas.json")
+        for perfil in REGISTRO.perfis_mais_lentos():
+            st.caption(f"Turno perfilado: {perfil['duracao_ms']:.0f} ms")
+            st.code(perfil["perfil"])
@@ -0,0 +1,246 @@
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from instrumentacao import medir
+
+try: import fcntl
+except ImportError: fcntl = None  # Windows: só o lock entre threads do processo
+
+CLIENTE_PADRAO = "BTG-78901"
+SALDO_INICIAL = 20000.0
+CAMPOS_POSICAO = ("descricao", "categoria", "quantidade", "valor_total", "preco_medio", "valor_aplicado")
+
+
+def cliente_novo(cliente_id: str) -> Dict[str, Any]:
+    nome = "Ana Silva" if cliente_id == CLIENTE_PADRAO else None
+    return {"cliente_id": cliente_id, "nome_cliente": nome, "perfil_investidor": None, "saldo_conta_corrente": SALDO_INICIAL, "carteira_investimentos": []}
+
+
+class Armazenamento:
+    """
+    Interface dos backends de carteira, chaveados por cliente_id.
+    `transacao` faz o ciclo ler-modificar-gravar de um cliente de forma atômica:
+    o bloco recebe os dados e, se os alterar, eles são gravados ao sair sem exceção.
+    `operacao` descreve a alteração (compra, venda, perfil) e `execucoes`, lida ao
+    final do bloco, as negociações feitas (lado, ticker, quantidade, preço, valor),
+    para backends que registram o histórico.
+    """
+
+    def carregar(self, cliente_id: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def clientes(self) -> List[str]:
+        raise NotImplementedError
+
+    @contextmanager
+    def transacao(self, cliente_id: str, operacao: str = "ajuste", execucoes: List[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+        yield
+
+    def salvar(self, dados: Dict[str, Any]):
+        with self.transacao(dados["cliente_id"]) as atual:
+            atual.clear()
+            atual.update(copy.deepcopy(dados))
+
+    def importar_json(self, caminho: str) -> List[str]:
+        """Importa um arquivo no formato do carteira.json (um cliente ou uma lista de clientes)."""
+        with open(caminho, "r", encoding="utf-8") as f: conteudo = json.load(f)
+        registros = conteudo if isinstance(conteudo, list) else [conteudo]
+        for dados in registros: self.salvar(dados)
+        return [d["cliente_id"] for d in registros]
+
+    def exportar_json(self, caminho: str, cliente_ids: List[str] = None):
+        """Exporta no formato do carteira.json; um único cliente vira um objeto, vários viram uma lista."""
+        ids = self.clientes() if cliente_ids is None else cliente_ids
+        registros = [self.carregar(c) for c in ids]
+        _gravar_json_atomico(caminho, registros[0] if len(registros) == 1 else registros)
+
+
+def _ler_umask() -> int:
+    """Umask do processo, lida em /proc sem alterá-la (os.umask só lê trocando o valor do processo inteiro, no meio de outras threads)."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for linha in f:
+                if linha.startswith("Umask:"): return int(linha.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    return 0o022  # sem /proc (ou kernel antigo): arquivos novos com 0644
+
+
+_UMASK = _ler_umask()
+
+
+def _copiar_modo(temporario: str, caminho: str):
+    """mkstemp cria o temporário com 0600 e o os.replace levaria esse modo ao destino: mantém o modo atual (ou o padrão pela umask)."""
+    try: modo = os.stat(caminho).st_mode & 0o7777
+    except FileNotFoundError: modo = 0o666 & ~_UMASK
+    os.chmod(temporario, modo)
+
+
+def _gravar_json_atomico(caminho: str, conteudo: Any):
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    fd, temporario = tempfile.mkstemp(dir=pasta, prefix=".carteira-", suffix=".tmp")
+    try:
+        _copiar_modo(temporario, caminho)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            with medir("json.gravar_carteiras"): json.dump(conteudo, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario): os.remove(temporario)
+        raise
+
+
+class ArmazenamentoJSON(Armazenamento):
+    """
+    Backend compatível com o carteira.json atual. Cada gravação troca o arquivo
+    inteiro de forma atômica (arquivo temporário + os.replace), sob um lock de
+    processo e, onde houver fcntl, um lock de arquivo entre processos.
+    """
+
+    def __init__(self, caminho: str = "carteira.json"):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _bloqueio(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.caminho + ".lock", "a") as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                try: yield
+                finally: fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _ler_todos(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f, medir("json.ler_carteiras"): conteudo = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:  # nunca como vazio: a próxima gravação apagaria todos os clientes do arquivo
+            raise ValueError(f"Arquivo de carteiras '{self.caminho}' corrompido; corrija ou restaure o arquivo antes de continuar.") from e
+        registros = conteudo if isinstance(conteudo, list) else [conteudo]
+        return {d["cliente_id"]: d for d in registros}
+
+    def carregar(self, cliente_id: str) -> Dict[str, Any]:
+        return self._ler_todos().get(cliente_id) or cliente_novo(cliente_id)
+
+    def clientes(self) -> List[str]:
+        return list(self._ler_todos())
+
+    @contextmanager
+    def transacao(self, cliente_id: str, operacao: str = "ajuste", execucoes: List[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        with self._bloqueio():
+            todos = self._ler_todos()
+            original = todos.get(cliente_id) or cliente_novo(cliente_id)
+            dados = copy.deepcopy(original)
+            yield dados
+            if dados != original or cliente_id not in todos:
+                todos[cliente_id] = dados
+                registros = list(todos.values())
+                _gravar_json_atomico(self.caminho, registros[0] if len(registros) == 1 else registros)
+
+
+class ArmazenamentoSQLite(Armazenamento):
+    """
+    Backend SQLite em modo WAL, com uma linha por cliente e uma por posição.
+    Cada transação usa BEGIN IMMEDIATE, então ler-modificar-gravar de um mesmo
+    cliente é serializado entre threads e processos, e a consulta de um cliente
+    lê apenas as linhas dele.
+    """
+
+    def __init__(self, caminho: str = "carteira.db"):
+        self.caminho = caminho
+        self._local = threading.local()
+        with self._conexao() as con:
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS clientes (
+                    cliente_id TEXT PRIMARY KEY, nome_cliente TEXT, perfil_investidor TEXT,
+                    saldo_conta_corrente REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS posicoes (
+                    cliente_id TEXT NOT NULL REFERENCES clientes(cliente_id), ticker TEXT NOT NULL,
+                    descricao TEXT, categoria TEXT, quantidade, valor_total, preco_medio, valor_aplicado,
+                    PRIMARY KEY (cliente_id, ticker));
+            """)
+
+    def _conexao(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=FULL")
+            self._local.con = con
+        return con
+
+    def _ler(self, con: sqlite3.Connection, cliente_id: str):
+        linha = con.execute("SELECT nome_cliente, perfil_investidor, saldo_conta_corrente FROM clientes WHERE cliente_id = ?", (cliente_id,)).fetchone()
+        if linha is None: return None
+        posicoes = []
+        for registro in con.execute(f"SELECT ticker, {', '.join(CAMPOS_POSICAO)} FROM posicoes WHERE cliente_id = ? ORDER BY rowid", (cliente_id,)):
+            posicao = {"ticker": registro[0]}
+            posicao.update({campo: valor for campo, valor in zip(CAMPOS_POSICAO, registro[1:]) if valor is not None})
+            posicoes.append(posicao)
+        return {"cliente_id": cliente_id, "nome_cliente": linha[0], "perfil_investidor": linha[1], "saldo_conta_corrente": linha[2], "carteira_investimentos": posicoes}
+
+    def carregar(self, cliente_id: str) -> Dict[str, Any]:
+        return self._ler(self._conexao(), cliente_id) or cliente_novo(cliente_id)
+
+    def clientes(self) -> List[str]:
+        return [linha[0] for linha in self._conexao().execute("SELECT cliente_id FROM clientes ORDER BY rowid")]
+
+    @contextmanager
+    def transacao(self, cliente_id: str, operacao: str = "ajuste", execucoes: List[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        con = self._conexao()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            original = self._ler(con, cliente_id)
+            dados = copy.deepcopy(original) if original else cliente_novo(cliente_id)
+            yield dados
+            if dados != original: self._gravar(con, original, dados)
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def _gravar(self, con: sqlite3.Connection, original, dados: Dict[str, Any]):
+        cliente_id = dados["cliente_id"]
+        con.execute("""INSERT INTO clientes (cliente_id, nome_cliente, perfil_investidor, saldo_conta_corrente) VALUES (?, ?, ?, ?)
+                       ON CONFLICT(cliente_id) DO UPDATE SET nome_cliente = excluded.nome_cliente,
+                       perfil_investidor = excluded.perfil_investidor, saldo_conta_corrente = excluded.saldo_conta_corrente""",
+                    (cliente_id, dados.get("nome_cliente"), dados.get("perfil_investidor"), dados["saldo_conta_corrente"]))
+        antigas = {p["ticker"]: p for p in (original or {}).get("carteira_investimentos", [])}
+        novas = {p["ticker"]: p for p in dados["carteira_investimentos"]}
+        for ticker in antigas.keys() - novas.keys():
+            con.execute("DELETE FROM posicoes WHERE cliente_id = ? AND ticker = ?", (cliente_id, ticker))
+        colunas = ", ".join(CAMPOS_POSICAO)
+        atualizacao = ", ".join(f"{c} = excluded.{c}" for c in CAMPOS_POSICAO)
+        for ticker, posicao in novas.items():
+            if antigas.get(ticker) == posicao: continue
+            con.execute(f"""INSERT INTO posicoes (cliente_id, ticker, {colunas}) VALUES (?, ?, {', '.join('?' * len(CAMPOS_POSICAO))})
+                            ON CONFLICT(cliente_id, ticker) DO UPDATE SET {atualizacao}""",
+                        (cliente_id, ticker, *(posicao.get(c) for c in CAMPOS_POSICAO)))
+
+
+BACKENDS = {"json": ArmazenamentoJSON, "sqlite": ArmazenamentoSQLite}
+
+
+def criar_armazenamento(backend: str = None, caminho: str = None) -> Armazenamento:
+    """Backend escolhido por parâmetro ou pela variável CARTEIRA_BACKEND (padrão: json)."""
+    nome = (backend or os.getenv("CARTEIRA_BACKEND") or "json").lower()
+    if nome == "diario" and nome not in BACKENDS:
+        from diario import ArmazenamentoDiario
+        BACKENDS["diario"] = ArmazenamentoDiario
+    if nome == "binario" and nome not in BACKENDS:
+        from carteira import ArmazenamentoBinario
+        BACKENDS["binario"] = ArmazenamentoBinario
+    if nome not in BACKENDS: raise ValueError(f"Backend de carteira desconhecido: '{nome}'.")
+    caminho = caminho or os.getenv("CARTEIRA_CAMINHO")
+    return BACKENDS[nome](caminho) if caminho else BACKENDS[nome]()
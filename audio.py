@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import warnings
+import wave
+from typing import Any, BinaryIO, Callable, Dict, NamedTuple, Optional, Tuple
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try: import audioop  # removido no Python 3.13; sem ele, WAV vai pelo ffmpeg ou sem conversão
+    except ImportError: audioop = None
+
+# Estágio de áudio dos comandos de voz: o upload é lido em blocos (hash e cópia
+# para disco numa só passada, sem getvalue()), convertido para fala compacta (mono, 16 kHz) e
+# transcrito uma única vez por conteúdo; a transcrição fica em cache pelo hash.
+
+TAMANHO_BLOCO = 1 << 20  # 1 MiB por leitura do upload
+QUADROS_POR_BLOCO = 1 << 16
+TAXA_FALA = 16_000
+LIMITE_INLINE = 8 << 20  # acima disso o áudio vai por upload de arquivo, não inline na requisição
+PASTA_CACHE_AUDIO = ".cache_audio"
+MAX_TRANSCRICOES = 1000  # entradas do cache de transcrições; as mais antigas saem primeiro
+MODELO_TRANSCRICAO = "models/gemini-flash-latest"
+PROMPT_TRANSCRICAO = "Transcreva literalmente o comando de voz a seguir, em português. Responda apenas com a transcrição."
+
+
+class ComandoVoz(NamedTuple):
+    hash: str
+    transcricao: str
+    em_cache: bool
+    bytes_originais: int
+    bytes_enviados: int  # 0 quando a transcrição veio do cache
+
+
+def copiar_com_hash(arquivo: BinaryIO, destino: BinaryIO, tamanho_bloco: int = TAMANHO_BLOCO) -> Tuple[str, int]:
+    """Copia o upload para `destino` em blocos, calculando o sha256. Retorna (hash, bytes lidos)."""
+    if hasattr(arquivo, "seek"): arquivo.seek(0)
+    sha, total = hashlib.sha256(), 0
+    while True:
+        bloco = arquivo.read(tamanho_bloco)
+        if not bloco: break
+        sha.update(bloco)
+        destino.write(bloco)
+        total += len(bloco)
+    return sha.hexdigest(), total
+
+
+def _e_wav(caminho: str) -> bool:
+    with open(caminho, "rb") as f: cabecalho = f.read(12)
+    return cabecalho[:4] == b"RIFF" and cabecalho[8:12] == b"WAVE"
+
+
+def _normalizar_wav(origem: str, destino: str, taxa: int = TAXA_FALA):
+    """Converte um WAV PCM para mono, 16 bits, no máximo `taxa` Hz, bloco a bloco."""
+    with wave.open(origem, "rb") as entrada:
+        canais, largura, taxa_origem = entrada.getnchannels(), entrada.getsampwidth(), entrada.getframerate()
+        if canais not in (1, 2): raise wave.Error(f"{canais} canais não suportados")
+        taxa_saida, estado = min(taxa, taxa_origem), None
+        with wave.open(destino, "wb") as saida:
+            saida.setnchannels(1)
+            saida.setsampwidth(2)
+            saida.setframerate(taxa_saida)
+            while True:
+                quadros = entrada.readframes(QUADROS_POR_BLOCO)
+                if not quadros: break
+                if largura == 1: quadros = audioop.bias(quadros, 1, -128)  # WAV de 8 bits é sem sinal
+                if canais == 2: quadros = audioop.tomono(quadros, largura, 0.5, 0.5)
+                if largura != 2: quadros = audioop.lin2lin(quadros, largura, 2)
+                if taxa_saida != taxa_origem: quadros, estado = audioop.ratecv(quadros, 2, 1, taxa_origem, taxa_saida, estado)
+                saida.writeframes(quadros)
+
+
+def _normalizar_ffmpeg(origem: str, destino: str, taxa: int = TAXA_FALA):
+    subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", origem, "-vn", "-ac", "1", "-ar", str(taxa),
+                    "-c:a", "libopus", "-b:a", "24k", "-f", "ogg", destino], check=True, timeout=120)
+
+
+def normalizar(origem: str, mime_type: str, pasta: str, taxa: int = TAXA_FALA) -> Tuple[str, str]:
+    """
+    Gera uma versão compacta do áudio para o modelo. WAV é convertido em Python;
+    os demais formatos (m4a, mp3) passam pelo ffmpeg quando ele está instalado.
+    Sem conversão possível, devolve o arquivo original. Retorna (caminho, mime_type).
+    """
+    if audioop is not None and _e_wav(origem):
+        destino = os.path.join(pasta, "normalizado.wav")
+        try:
+            _normalizar_wav(origem, destino, taxa)
+            return destino, "audio/wav"
+        except (wave.Error, EOFError, audioop.error):
+            pass
+    if shutil.which("ffmpeg"):
+        destino = os.path.join(pasta, "normalizado.ogg")
+        try:
+            _normalizar_ffmpeg(origem, destino, taxa)
+            return destino, "audio/ogg"
+        except (subprocess.SubprocessError, OSError):
+            pass
+    return origem, mime_type
+
+
+def transcritor(modelo, prompt: str = PROMPT_TRANSCRICAO) -> Callable[[Any], str]:
+    """Transcrição com uma chamada generate_content de um modelo sem ferramentas (genai ou modelo_local)."""
+    return lambda parte: (modelo.generate_content([prompt, parte]).text or "").strip()
+
+
+# Helpers do Gemini para o app: ficam aqui, e não em ferramentas.py, para que o
+# cliente fino do serviço transcreva voz sem importar o agente e o simulador.
+def criar_transcritor_gemini(nome_modelo: str = MODELO_TRANSCRICAO) -> Callable[[Any], str]:
+    """Modelo sem ferramentas nem prompt de sistema, usado só para transcrever comandos de voz."""
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return transcritor(genai.GenerativeModel(model_name=nome_modelo))
+
+
+def enviar_arquivo_gemini(caminho: str, mime_type: str):
+    import google.generativeai as genai
+    return genai.upload_file(path=caminho, mime_type=mime_type)
+
+
+def apagar_arquivo_gemini(arquivo):
+    import google.generativeai as genai
+    genai.delete_file(arquivo.name)
+
+
+class ProcessadorAudio:
+    """
+    Transforma um upload de áudio em texto de comando. O upload é copiado em
+    blocos para um temporário, convertido bloco a bloco e só a versão compacta
+    (pequena) vai inline para o modelo; se ainda passar de `limite_inline`, vai
+    por `enviar_arquivo` (ex.: genai.upload_file) e é apagada depois com
+    `apagar_arquivo`. O UploadedFile do Streamlit já está inteiro na memória: o
+    tamanho dele é limitado por server.maxUploadSize (.streamlit/config.toml).
+    As transcrições ficam num cache em disco pelo sha256 do conteúdo, limitado a
+    `max_transcricoes` e compartilhado entre sessões, então um áudio repetido
+    não gera nova chamada ao modelo.
+    """
+
+    def __init__(self, transcrever: Callable[[Any], str], pasta_cache: Optional[str] = PASTA_CACHE_AUDIO,
+                 enviar_arquivo: Callable[[str, str], Any] = None, apagar_arquivo: Callable[[Any], None] = None,
+                 limite_inline: int = LIMITE_INLINE, taxa: int = TAXA_FALA, max_transcricoes: int = MAX_TRANSCRICOES):
+        self.transcrever = transcrever
+        self.enviar_arquivo = enviar_arquivo
+        self.apagar_arquivo = apagar_arquivo
+        self.limite_inline = limite_inline
+        self.taxa = taxa
+        self.max_transcricoes = max_transcricoes
+        self._arquivo_cache = os.path.join(pasta_cache, "transcricoes.json") if pasta_cache else None
+        self._cache: Optional[Dict[str, str]] = None
+        self._trava = threading.Lock()  # o processador é um só para todas as sessões do app (st.cache_resource)
+
+    def _transcricoes(self) -> Dict[str, str]:
+        if self._cache is None:
+            try:
+                with open(self._arquivo_cache, "r", encoding="utf-8") as f: cache = json.load(f)
+                self._cache = cache if isinstance(cache, dict) else {}
+            except (TypeError, OSError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def _transcricao(self, hash_audio: str) -> Optional[str]:
+        with self._trava: return self._transcricoes().get(hash_audio)
+
+    def _guardar(self, hash_audio: str, transcricao: str):
+        with self._trava:
+            cache = self._transcricoes()
+            cache.pop(hash_audio, None)
+            cache[hash_audio] = transcricao
+            while len(cache) > self.max_transcricoes: del cache[next(iter(cache))]
+            if not self._arquivo_cache: return
+            try:
+                os.makedirs(os.path.dirname(self._arquivo_cache), exist_ok=True)
+                temporario = f"{self._arquivo_cache}.{os.getpid()}.tmp"
+                with open(temporario, "w", encoding="utf-8") as f: json.dump(cache, f, ensure_ascii=False)
+                os.replace(temporario, self._arquivo_cache)
+            except (OSError, TypeError, ValueError):
+                pass  # o cache em memória continua valendo neste processo
+
+    def _parte(self, caminho: str, mime_type: str) -> Any:
+        tamanho = os.path.getsize(caminho)
+        if tamanho > self.limite_inline and self.enviar_arquivo is not None: return self.enviar_arquivo(caminho, mime_type)
+        with open(caminho, "rb") as f: return {"mime_type": mime_type, "data": f.read()}
+
+    def _transcrever(self, caminho: str, mime_type: str) -> str:
+        parte = self._parte(caminho, mime_type)
+        try: return self.transcrever(parte)
+        finally:
+            if not isinstance(parte, dict) and self.apagar_arquivo is not None:
+                try: self.apagar_arquivo(parte)
+                except Exception: pass  # o arquivo expira sozinho no serviço; não perde a transcrição por isso
+
+    def processar(self, arquivo: BinaryIO, mime_type: str) -> ComandoVoz:
+        with tempfile.TemporaryDirectory(prefix="audio_") as pasta:
+            original = os.path.join(pasta, "original")
+            with open(original, "wb") as destino: hash_audio, tamanho = copiar_com_hash(arquivo, destino)
+            transcricao = self._transcricao(hash_audio)
+            if transcricao is not None: return ComandoVoz(hash_audio, transcricao, True, tamanho, 0)
+            caminho, mime_compacto = normalizar(original, mime_type, pasta, self.taxa)
+            enviados = os.path.getsize(caminho)
+            transcricao = self._transcrever(caminho, mime_compacto)
+        if transcricao: self._guardar(hash_audio, transcricao)
+        return ComandoVoz(hash_audio, transcricao, False, tamanho, enviados)
@@ -0,0 +1,143 @@
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple
+
+import numpy as np
+
+from catalogo import Catalogo
+
+PERFIS = ("Conservador", "Moderado", "Arrojado")
+
+
+class LotePosicoes(NamedTuple):
+    """Posições de um lote de clientes em arrays paralelos."""
+    clientes: List[str]
+    linhas: np.ndarray
+    colunas: np.ndarray
+    quantidades: np.ndarray
+    custos: np.ndarray
+
+
+class Avaliador:
+    """
+    Marcação a mercado vetorizada das carteiras.
+    Preços, categorias e perfis ficam em arrays indexados pela coluna do ticker;
+    as posições de um lote de clientes ficam em arrays paralelos (LotePosicoes).
+    Reavaliar o lote inteiro após uma atualização de preços é uma única passada
+    NumPy, sem laços por dicionário. Os preços ao vivo entram por chamada
+    (`precos_de`), sem alterar o avaliador compartilhado entre threads.
+    Renda fixa e fundos entram com quantidade = valor aplicado e preço 1.0.
+    O valor de um produto indicado a vários perfis é dividido igualmente entre
+    eles, então a alocação por perfil soma no máximo 100%.
+    """
+
+    def __init__(self, catalogo: Catalogo):
+        self.versao_catalogo = catalogo.versao
+        self.categorias: List[str] = list(catalogo.categorias())
+        self._coluna: Dict[str, int] = {}
+        precos, categorias, perfis = [], [], []
+        for codigo, categoria in enumerate(self.categorias):
+            for produto in catalogo.por_categoria(categoria):
+                chave = produto.ticker.upper()
+                if chave in self._coluna: continue
+                self._coluna[chave] = len(precos)
+                precos.append(np.nan if produto.preco is None else produto.preco)
+                categorias.append(codigo)
+                perfis.append(sum(1 << i for i, perfil in enumerate(PERFIS) if perfil in produto.perfil))
+        self.precos = np.array(precos, dtype=np.float64)
+        self._categoria = np.array(categorias, dtype=np.int32)
+        self._perfis = np.array(perfis, dtype=np.int8)
+        self._lock = threading.Lock()
+        self._mapa_tabela = None  # (colunas da TabelaPrecos, índices de origem, índices de destino)
+        self._precos_tabela = None  # (versão, colunas, preços) do último instantâneo aplicado
+
+    def _coluna_para(self, ticker: str, categoria: str) -> int:
+        chave = ticker.upper()
+        if chave in self._coluna: return self._coluna[chave]
+        with self._lock:  # ticker fora do catálogo: sem preço, vale pelo custo
+            if chave in self._coluna: return self._coluna[chave]
+            if categoria not in self.categorias: self.categorias.append(categoria)
+            self.precos = np.append(self.precos, np.nan)
+            self._categoria = np.append(self._categoria, np.int32(self.categorias.index(categoria)))
+            self._perfis = np.append(self._perfis, np.int8(0))
+            self._coluna[chave] = len(self.precos) - 1
+            return self._coluna[chave]
+
+    def lote(self, carteiras: Iterable[Mapping[str, Any]]) -> LotePosicoes:
+        """Monta os arrays de posições a partir dos dados de carteira (formato do carteira.json)."""
+        clientes, linhas, colunas, quantidades, custos = [], [], [], [], []
+        for linha, dados in enumerate(carteiras):
+            clientes.append(dados["cliente_id"])
+            for posicao in dados["carteira_investimentos"]:
+                linhas.append(linha)
+                colunas.append(self._coluna_para(posicao["ticker"], posicao.get("categoria", "")))
+                if "quantidade" in posicao:
+                    quantidade = posicao["quantidade"]
+                    quantidades.append(quantidade)
+                    custos.append(quantidade * posicao.get("preco_medio", 0))
+                else:
+                    quantidades.append(posicao.get("valor_aplicado", 0))
+                    custos.append(posicao.get("valor_aplicado", 0))
+        return LotePosicoes(clientes, np.array(linhas, dtype=np.int64), np.array(colunas, dtype=np.int64),
+                            np.array(quantidades, dtype=np.float64), np.array(custos, dtype=np.float64))
+
+    def atualizar_precos(self, precos: Mapping[str, float]):
+        for ticker, preco in precos.items():
+            coluna = self._coluna.get(ticker.upper())
+            if coluna is not None: self.precos[coluna] = preco
+
+    def precos_de(self, instantaneo) -> np.ndarray:
+        """
+        Preços do catálogo com os de um precos.InstantaneoPrecos aplicados num só
+        passo vetorizado. Devolve um array novo, guardado para a mesma versão do
+        instantâneo; self.precos não muda.
+        """
+        guardado = self._precos_tabela
+        if guardado is not None and guardado[0] == instantaneo.versao and guardado[1] is instantaneo.colunas: return guardado[2]
+        mapa = self._mapa_tabela
+        if mapa is None or mapa[0] is not instantaneo.colunas:
+            pares = [(coluna, self._coluna[ticker]) for ticker, coluna in instantaneo.colunas.items() if ticker in self._coluna]
+            mapa = self._mapa_tabela = (instantaneo.colunas, np.array([o for o, _ in pares], dtype=np.int64),
+                                        np.array([d for _, d in pares], dtype=np.int64))
+        precos = self.precos.copy()
+        precos[mapa[2]] = np.frombuffer(instantaneo.precos, dtype=np.float64)[mapa[1]]
+        self._precos_tabela = (instantaneo.versao, instantaneo.colunas, precos)
+        return precos
+
+    def valores_mercado(self, lote: LotePosicoes, precos: np.ndarray = None) -> np.ndarray:
+        """Valor de mercado de cada posição do lote, pelos `precos` dados (padrão: os do catálogo)."""
+        if precos is None: precos = self.precos
+        elif len(precos) < len(self.precos): precos = np.concatenate([precos, self.precos[len(precos):]])  # tickers fora do catálogo vistos depois
+        precos = precos[lote.colunas]
+        return np.where(np.isnan(precos), lote.custos, lote.quantidades * precos)
+
+    def reavaliar(self, lote: LotePosicoes, precos: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Totais por cliente: valor de mercado, custo, P&L não realizado e alocação por categoria e por perfil."""
+        n = len(lote.clientes)
+        valores = self.valores_mercado(lote, precos)
+        valor = np.bincount(lote.linhas, weights=valores, minlength=n)
+        custo = np.bincount(lote.linhas, weights=lote.custos, minlength=n)
+        n_categorias = len(self.categorias)
+        por_categoria = np.bincount(lote.linhas * n_categorias + self._categoria[lote.colunas], weights=valores,
+                                    minlength=n * n_categorias).reshape(n, n_categorias)
+        perfis = self._perfis[lote.colunas]
+        marcas = [(perfis >> i) & 1 for i in range(len(PERFIS))]
+        fracao = valores / np.maximum(sum(marcas), 1)  # dividido entre os perfis do produto
+        por_perfil = np.stack([np.bincount(lote.linhas, weights=fracao * marca, minlength=n) for marca in marcas], axis=1)
+        return {"valor_mercado": valor, "custo": custo, "pnl_nao_realizado": valor - custo,
+                "por_categoria": por_categoria, "por_perfil": por_perfil}
+
+    def resumo(self, lote: LotePosicoes, indice: int, totais: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        valor = float(totais["valor_mercado"][indice])
+        alocacao = lambda nomes, linha: {nome: {"valor": round(float(v), 2), "percentual": round(float(v) / valor * 100, 2) if valor else 0.0}
+                                         for nome, v in zip(nomes, linha) if v}
+        return {"cliente_id": lote.clientes[indice], "valor_mercado": round(valor, 2),
+                "custo": round(float(totais["custo"][indice]), 2),
+                "pnl_nao_realizado": round(float(totais["pnl_nao_realizado"][indice]), 2),
+                "alocacao_por_categoria": alocacao(self.categorias, totais["por_categoria"][indice]),
+                "alocacao_por_perfil": alocacao(PERFIS, totais["por_perfil"][indice])}
+
+
+def avaliar_carteiras(avaliador: Avaliador, carteiras: List[Mapping[str, Any]], precos: np.ndarray = None) -> List[Dict[str, Any]]:
+    lote = avaliador.lote(carteiras)
+    totais = avaliador.reavaliar(lote, precos)
+    return [avaliador.resumo(lote, i, totais) for i in range(len(lote.clientes))]
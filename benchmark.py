@@ -0,0 +1,794 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from contextlib import contextmanager
+
+import agente
+import simulador_carteira
+from armazenamento import SALDO_INICIAL, ArmazenamentoJSON, cliente_novo, criar_armazenamento
+from audio import ProcessadorAudio, transcritor
+from carteira import Carteira, para_centavos
+from avaliacao import Avaliador
+from catalogo import PASTA_CACHE, Catalogo
+from diario import ArmazenamentoDiario
+from historico import GerenciadorHistorico, tamanho_conteudos
+from instrumentacao import REGISTRO
+from modelo_local import ModeloLocal, roteiro_chamadas
+from precos import IngestorPrecos, TabelaPrecos, ingerir_arquivo
+from recomendacao import MotorRecomendacao
+from servico_agente import ServicoAgente, ServicoOcupado
+
+# Uso: python benchmark.py <cenario> [opções]
+
+
+def _gerar_catalogo(caminho: str, tamanho: int, seed: int = 42):
+    rnd = random.Random(seed)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump([{"ticker": f"TK{i:07d}", "descricao": f"Ativo sintético {i}", "Preco": f"{rnd.uniform(0.01, 500):.2f}".replace(".", ",")}
+                   for i in range(tamanho)], f)
+
+
+def bench_catalogo(args):
+    """Custo de busca por ticker no catálogo indexado para catálogos de tamanhos crescentes."""
+    rnd = random.Random(7)
+    print(f"{'tickers':>10} {'carga (s)':>10} {'busca (µs)':>11}")
+    for tamanho in args.tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "catalogo.json")
+            _gerar_catalogo(caminho, tamanho)
+            inicio = time.perf_counter()
+            catalogo = Catalogo(arquivos={"renda_variavel": caminho}, pasta_cache=None)
+            len(catalogo)  # o catálogo é preguiçoso: força a carga dentro da medição
+            carga = time.perf_counter() - inicio
+            tickers = [f"tk{rnd.randrange(tamanho):07d}" for _ in range(args.buscas)]
+            inicio = time.perf_counter()
+            for t in tickers: catalogo.buscar(t)
+            busca = (time.perf_counter() - inicio) / args.buscas * 1e6
+        print(f"{tamanho:>10} {carga:>10.3f} {busca:>11.3f}")
+
+
+class _ArmazenamentoLegado(ArmazenamentoJSON):
+    """Reproduz o _carregar_dados/_salvar_dados original: sem lock e reescrevendo o arquivo no lugar."""
+
+    @contextmanager
+    def transacao(self, cliente_id: str, operacao: str = "ajuste"):
+        dados = self._ler_todos().get(cliente_id) or cliente_novo(cliente_id)
+        yield dados
+        todos = self._ler_todos()
+        todos[cliente_id] = dados
+        registros = list(todos.values())
+        with open(self.caminho, "w", encoding="utf-8") as f: json.dump(registros[0] if len(registros) == 1 else registros, f)
+
+
+def bench_persistencia(args):
+    """Compras/vendas concorrentes por vários clientes; verifica atualizações perdidas e mede ops/s por backend."""
+    print(f"{'backend':>8} {'ops':>7} {'ops/s':>9} {'perdidas':>9}")
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as pasta:
+            if backend == "legado": armazenamento = _ArmazenamentoLegado(os.path.join(pasta, "carteira.json"))
+            else: armazenamento = criar_armazenamento(backend, os.path.join(pasta, f"carteira.{'db' if backend == 'sqlite' else 'json'}"))
+            original, simulador_carteira.ARMAZENAMENTO = simulador_carteira.ARMAZENAMENTO, armazenamento
+            aplicado = {}  # cliente -> valor líquido aplicado segundo as respostas de sucesso
+            trava = threading.Lock()
+
+            def trabalhador(indice: int):
+                cliente = f"CLI-{indice % args.clientes:04d}"
+                rnd, liquido = random.Random(indice), 0
+                for _ in range(args.ops):
+                    if rnd.random() < 0.6 or liquido == 0:
+                        ok = json.loads(simulador_carteira.comprar_ativo("CDB_BTG_DI", valor=1.0, cliente_id=cliente))["status"] == "sucesso"
+                        liquido += ok
+                    else:
+                        ok = json.loads(simulador_carteira.vender_ativo("CDB_BTG_DI", valor=1.0, cliente_id=cliente))["status"] == "sucesso"
+                        liquido -= ok
+                with trava: aplicado[cliente] = aplicado.get(cliente, 0) + liquido
+
+            threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(args.threads)]
+            inicio = time.perf_counter()
+            try:
+                for t in threads: t.start()
+                for t in threads: t.join()
+            finally:
+                simulador_carteira.ARMAZENAMENTO = original
+            duracao = time.perf_counter() - inicio
+            perdidas = 0
+            for cliente, esperado in aplicado.items():
+                dados = armazenamento.carregar(cliente)
+                posicao = next((p for p in dados["carteira_investimentos"] if p["ticker"] == "CDB_BTG_DI"), {})
+                perdidas += abs(esperado - round(posicao.get("valor_aplicado", 0))) + abs(round(SALDO_INICIAL - dados["saldo_conta_corrente"]) - esperado)
+            total = args.threads * args.ops
+            print(f"{backend:>8} {total:>7} {total / duracao:>9.0f} {perdidas:>9}")
+
+
+def _percentil(amostras, p: float) -> float:
+    ordenadas = sorted(amostras)
+    return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))]
+
+
+def bench_diario(args):
+    """Latência de append no diário de operações e tempo de recuperação a frio para um diário de N eventos."""
+    with tempfile.TemporaryDirectory() as pasta:
+        diario = ArmazenamentoDiario(os.path.join(pasta, "append"), eventos_por_snapshot=args.eventos_por_snapshot)
+        original, simulador_carteira.ARMAZENAMENTO = simulador_carteira.ARMAZENAMENTO, diario
+        latencias = []
+        try:
+            for i in range(args.appends):
+                inicio = time.perf_counter()
+                simulador_carteira.comprar_ativo("CDB_BTG_DI", valor=1.0, cliente_id=f"CLI-{i % 100:04d}")
+                latencias.append(time.perf_counter() - inicio)
+        finally:
+            simulador_carteira.ARMAZENAMENTO = original
+        print(f"append (compra completa, com fsync): p50={_percentil(latencias, 50) * 1e3:.3f} ms p99={_percentil(latencias, 99) * 1e3:.3f} ms")
+
+        pasta_recuperacao = os.path.join(pasta, "recuperacao")
+        os.makedirs(pasta_recuperacao)
+        rnd = random.Random(1)
+        with open(os.path.join(pasta_recuperacao, "eventos.00000000.log"), "w", encoding="utf-8") as f:
+            for i in range(args.eventos):
+                cliente, ticker = f"CLI-{rnd.randrange(args.clientes):05d}", f"TK{rnd.randrange(50):03d}"
+                f.write(json.dumps({"op": "compra", "c": cliente, "saldo": 20000.0 - i % 1000,
+                                    "pos": {ticker: {"ticker": ticker, "categoria": "renda_variavel", "quantidade": i % 97 + 1, "valor_total": float(i % 97 + 1)}}},
+                                   separators=(",", ":")) + "\n")
+        tamanho = os.path.getsize(os.path.join(pasta_recuperacao, "eventos.00000000.log"))
+        inicio = time.perf_counter()
+        recuperado = ArmazenamentoDiario(pasta_recuperacao, eventos_por_snapshot=args.eventos + 1)
+        duracao = time.perf_counter() - inicio
+        print(f"recuperação só pelo diário: {args.eventos} eventos ({tamanho / 1e6:.1f} MB) em {duracao:.2f} s ({args.eventos / duracao:.0f} eventos/s)")
+        recuperado.compactar()
+        inicio = time.perf_counter()
+        ArmazenamentoDiario(pasta_recuperacao)
+        print(f"recuperação pelo snapshot após compactar: {time.perf_counter() - inicio:.3f} s")
+
+
+def bench_avaliacao(args):
+    """Reavaliação vetorizada de N carteiras sintéticas após uma atualização de preços."""
+    catalogo = simulador_carteira.CATALOGO
+    produtos = [p for c in catalogo.categorias() for p in catalogo.por_categoria(c) if p.preco is not None]
+    rnd = random.Random(3)
+    carteiras = []
+    for i in range(args.carteiras):
+        posicoes = []
+        for p in rnd.sample(produtos, args.posicoes):
+            if p.categoria in ("renda_variavel", "criptomoedas"):
+                posicoes.append({"ticker": p.ticker, "categoria": p.categoria, "quantidade": rnd.randint(1, 100), "preco_medio": p.preco * rnd.uniform(0.8, 1.2)})
+            else: posicoes.append({"ticker": p.ticker, "categoria": p.categoria, "valor_aplicado": rnd.uniform(100, 5000)})
+        carteiras.append({"cliente_id": f"CLI-{i:06d}", "carteira_investimentos": posicoes})
+    avaliador = Avaliador(catalogo)
+    inicio = time.perf_counter()
+    lote = avaliador.lote(carteiras)
+    print(f"montagem do lote: {len(carteiras)} carteiras, {len(lote.linhas)} posições em {time.perf_counter() - inicio:.3f} s")
+    tempos = []
+    for _ in range(args.rodadas):
+        avaliador.atualizar_precos({p.ticker: p.preco * rnd.uniform(0.95, 1.05) for p in produtos})
+        inicio = time.perf_counter()
+        avaliador.reavaliar(lote)
+        tempos.append(time.perf_counter() - inicio)
+    print(f"reavaliação completa após atualização de preços: p50={_percentil(tempos, 50) * 1e3:.1f} ms")
+
+
+def _funcoes_com_latencia(latencia: float):
+    def envolver(funcao):
+        def chamada(**kwargs):
+            time.sleep(latencia)  # simula E/S do armazenamento/rede da ferramenta
+            return funcao(**kwargs)
+        return chamada
+    return {nome: envolver(getattr(simulador_carteira, nome)) for nome in agente.FERRAMENTAS_LEITURA}
+
+
+def _turno_sequencial(chat, conteudo, funcoes):
+    """Loop original do app: sem streaming, uma chamada de função por ida e volta ao modelo."""
+    resposta = chat.send_message(conteudo, stream=False)
+    while True:
+        chamadas = [p.function_call for p in resposta.candidates[0].content.parts if p.function_call.name]
+        if not chamadas: return resposta.text
+        for chamada in chamadas:
+            resultado = funcoes[chamada.name](**chamada.args)
+            resposta = chat.send_message({"function_response": {"name": chamada.name, "response": {"result": resultado}}}, stream=False)
+
+
+def bench_agente(args):
+    """Tempo até o primeiro token e tempo total por turno: loop sequencial original vs. chamadas paralelas com streaming."""
+    funcoes = _funcoes_com_latencia(args.latencia_ferramenta)
+    modelo = ModeloLocal(latencia_primeiro_token=args.latencia_modelo, latencia_por_token=args.latencia_token)
+    print(f"{'loop':>11} {'1º token (ms)':>14} {'total (ms)':>11}")
+    for nome in ("sequencial", "paralelo"):
+        primeiros, totais = [], []
+        for _ in range(args.turnos):
+            chat = modelo.start_chat(history=[])
+            inicio = time.perf_counter()
+            if nome == "sequencial":
+                _turno_sequencial(chat, ["Quero investir"], funcoes)
+                primeiros.append(time.perf_counter() - inicio)
+            else:
+                for i, _trecho in enumerate(agente.executar_turno(chat, ["Quero investir"], funcoes)):
+                    if i == 0: primeiros.append(time.perf_counter() - inicio)
+            totais.append(time.perf_counter() - inicio)
+        print(f"{nome:>11} {_percentil(primeiros, 50) * 1e3:>14.1f} {_percentil(totais, 50) * 1e3:>11.1f}")
+
+
+def bench_recomendacao(args):
+    """Latência de uma página de sugestões (primeira e seguintes) sobre um catálogo sintético grande."""
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "catalogo.json")
+        _gerar_catalogo(caminho, args.produtos)
+        catalogo = Catalogo(arquivos={"renda_variavel": caminho}, pasta_cache=None)
+        len(catalogo)  # carrega antes de o diretório temporário ser apagado
+    inicio = time.perf_counter()
+    motor = MotorRecomendacao(catalogo)
+    print(f"pré-cálculo dos candidatos para {len(catalogo)} produtos: {time.perf_counter() - inicio:.2f} s")
+    rnd = random.Random(5)
+    dados = {"perfil_investidor": "Arrojado", "saldo_conta_corrente": 20000.0,
+             "carteira_investimentos": [{"ticker": "CDB_BTG_DI", "categoria": "renda_fixa", "valor_aplicado": 5000.0}]}
+    primeira, seguintes, cursor = [], [], None
+    for _ in range(args.chamadas):
+        dados["saldo_conta_corrente"] = rnd.uniform(100, 50000)
+        inicio = time.perf_counter()
+        pagina = motor.recomendar(dados, cursor)
+        (seguintes if cursor else primeira).append(time.perf_counter() - inicio)
+        cursor = pagina["proximo_cursor"] if rnd.random() < 0.7 else None
+    print(f"primeira página: p50={_percentil(primeira, 50) * 1e3:.3f} ms p99={_percentil(primeira, 99) * 1e3:.3f} ms")
+    if seguintes: print(f"páginas seguintes: p50={_percentil(seguintes, 50) * 1e3:.3f} ms p99={_percentil(seguintes, 99) * 1e3:.3f} ms")
+
+
+_MEDIR_IMPORTACAO = """
+import time
+inicio = time.perf_counter()
+import simulador_carteira
+importacao = time.perf_counter() - inicio
+inicio = time.perf_counter()
+simulador_carteira.CATALOGO.buscar("VALE3")
+print(importacao, time.perf_counter() - inicio)
+"""
+
+_APP_COM_MODELO_LOCAL = """
+import google.generativeai as genai
+from modelo_local import ModeloLocal
+genai.GenerativeModel = lambda **kw: ModeloLocal(latencia_primeiro_token=0, latencia_por_token=0)
+exec(compile(open({caminho!r}, encoding="utf-8").read(), {caminho!r}, "exec"))
+"""
+
+
+def bench_inicializacao(args):
+    """Tempo de importação a frio do simulador, primeira busca no catálogo (com e sem cache binário) e custo por rerun do app."""
+    for rotulo, limpar in (("sem cache", True), ("com cache", False)):
+        if limpar: shutil.rmtree(PASTA_CACHE, ignore_errors=True)
+        saida = subprocess.run([sys.executable, "-c", _MEDIR_IMPORTACAO], capture_output=True, text=True, check=True).stdout.split()
+        print(f"{rotulo:>9}: import simulador_carteira {float(saida[0]) * 1e3:.1f} ms, primeira busca {float(saida[1]) * 1e3:.1f} ms")
+    try: from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("streamlit não instalado: custo por rerun não medido")
+        return
+    with tempfile.TemporaryDirectory() as pasta:
+        roteiro = os.path.join(pasta, "app_local.py")
+        with open(roteiro, "w", encoding="utf-8") as f: f.write(_APP_COM_MODELO_LOCAL.format(caminho=os.path.abspath("app.py")))
+        app = AppTest.from_file(roteiro, default_timeout=60)
+        inicio = time.perf_counter()
+        app.run()
+        primeira = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        for _ in range(args.reruns): app.run()
+        print(f"app: primeira execução {primeira * 1e3:.1f} ms, rerun médio {(time.perf_counter() - inicio) / args.reruns * 1e3:.1f} ms")
+
+
+def bench_historico(args):
+    """Tamanho da requisição de início de turno ao longo de uma sessão longa, com e sem o gerenciador de histórico."""
+    funcoes = {nome: getattr(simulador_carteira, nome) for nome in agente.FERRAMENTAS_LEITURA}
+    modelo = ModeloLocal(latencia_primeiro_token=0, latencia_por_token=0)
+    marcos = sorted({1, 10, 50, 100, args.turnos} & set(range(1, args.turnos + 1)))
+    print(f"{'turno':>6} {'sem gerenciador (KB)':>21} {'com gerenciador (KB)':>21}")
+    resultados = {}
+    for rotulo, usar in (("sem", False), ("com", True)):
+        chat, historico, tamanhos = modelo.start_chat(history=[]), GerenciadorHistorico() if usar else None, []
+        for turno in range(args.turnos):
+            if not usar: tamanhos.append(tamanho_conteudos(chat.history))
+            for _ in agente.executar_turno(chat, [f"Quero investir ({turno})"], funcoes, historico=historico): pass
+        resultados[rotulo] = historico.tamanhos if usar else tamanhos
+    for marco in marcos:
+        print(f"{marco:>6} {resultados['sem'][marco - 1] / 1024:>21.1f} {resultados['com'][marco - 1] / 1024:>21.1f}")
+
+
+def bench_ordens(args):
+    """Rebalanceamento de N ordens: uma chamada de executar_ordens vs. N chamadas de comprar_ativo/vender_ativo."""
+    acoes = sorted((p for p in simulador_carteira.CATALOGO.por_categoria("renda_variavel") if p.preco and p.preco > 0), key=lambda p: p.preco)
+    metade = args.ordens // 2
+    if len(acoes) < args.ordens: raise SystemExit(f"catálogo com apenas {len(acoes)} ações precificadas")
+    vender, comprar = [p.ticker for p in acoes[:metade]], [p.ticker for p in acoes[metade:args.ordens]]
+    ordens = [{"tipo": "venda", "ticker": t, "quantidade": 1} for t in vender] + [{"tipo": "compra", "ticker": t, "quantidade": 1} for t in comprar]
+    print(f"{'backend':>8} {'modo':>10} {'ms/rebalanceamento':>19} {'transações':>11}")
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as pasta:
+            armazenamento = criar_armazenamento(backend, os.path.join(pasta, f"carteira.{'db' if backend == 'sqlite' else 'json'}"))
+            original, simulador_carteira.ARMAZENAMENTO = simulador_carteira.ARMAZENAMENTO, armazenamento
+            try:
+                for modo in ("sequencial", "lote"):
+                    duracao = 0.0
+                    for rodada in range(args.rodadas):
+                        cliente = f"{modo.upper()}-{rodada:04d}"
+                        for ticker in vender: simulador_carteira.comprar_ativo(ticker, quantidade=2, cliente_id=cliente)
+                        inicio = time.perf_counter()
+                        if modo == "lote": resultados = [json.loads(simulador_carteira.executar_ordens(ordens, cliente_id=cliente))]
+                        else:
+                            resultados = [json.loads(simulador_carteira.vender_ativo(o["ticker"], quantidade=1, cliente_id=cliente) if o["tipo"] == "venda"
+                                                     else simulador_carteira.comprar_ativo(o["ticker"], quantidade=1, cliente_id=cliente)) for o in ordens]
+                        duracao += time.perf_counter() - inicio
+                        if any(r["status"] != "sucesso" for r in resultados): raise SystemExit(f"{modo}: ordem recusada: {resultados}")
+                    print(f"{backend:>8} {modo:>10} {duracao / args.rodadas * 1e3:>19.2f} {1 if modo == 'lote' else len(ordens):>11}")
+            finally:
+                simulador_carteira.ARMAZENAMENTO = original
+
+
+def _gerar_wav(caminho: str, segundos: int, taxa: int = 44_100, canais: int = 2, seed: int = 42):
+    rnd = random.Random(seed)
+    with wave.open(caminho, "wb") as f:
+        f.setnchannels(canais)
+        f.setsampwidth(2)
+        f.setframerate(taxa)
+        for _ in range(segundos): f.writeframes(rnd.randbytes(taxa * canais * 2))
+
+
+def bench_audio(args):
+    """Bytes enviados, latência e pico de memória por comando de voz: áudio bruto inline (original) vs. pipeline com conversão e cache."""
+    funcoes = {nome: getattr(simulador_carteira, nome) for nome in agente.FERRAMENTAS_LEITURA}
+    modelo = ModeloLocal(latencia_primeiro_token=args.latencia_modelo, latencia_por_token=0, latencia_por_mb=args.latencia_por_mb)
+    print(f"{'duração':>8} {'modo':>17} {'enviado (KB)':>13} {'latência (ms)':>14} {'pico memória (MB)':>18}")
+    with tempfile.TemporaryDirectory() as pasta:
+        processador = ProcessadorAudio(transcritor(modelo), pasta_cache=os.path.join(pasta, "cache"))
+        for segundos in args.duracoes:
+            caminho = os.path.join(pasta, f"comando_{segundos}s.wav")
+            _gerar_wav(caminho, segundos, seed=segundos)
+            for modo in ("original", "pipeline", "pipeline (repetido)"):
+                chat, inicio_requisicoes = modelo.start_chat(history=[]), len(modelo.requisicoes)
+                tracemalloc.start()
+                inicio = time.perf_counter()
+                with open(caminho, "rb") as arquivo:
+                    if modo == "original":
+                        conteudo = ["Execute o comando de voz.", {"mime_type": "audio/wav", "data": arquivo.read()}]  # getvalue() do upload
+                    else:
+                        comando = processador.processar(arquivo, "audio/wav")
+                        conteudo = [f"Execute o comando de voz. Comando de voz (transcrito): {comando.transcricao}"]
+                for _ in agente.executar_turno(chat, conteudo, funcoes): pass
+                duracao = time.perf_counter() - inicio
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                enviado = sum(chat.requisicoes) + sum(modelo.requisicoes[inicio_requisicoes:])
+                print(f"{segundos:>7}s {modo:>17} {enviado / 1024:>13.0f} {duracao * 1e3:>14.0f} {pico / 2**20:>18.1f}")
+
+
+def bench_instrumentacao(args):
+    """Custo da instrumentação (ligada vs. desligada) e o resumo por etapa de uma sessão com o modelo local."""
+    funcoes = _funcoes_com_latencia(0)
+    modelo = ModeloLocal(latencia_primeiro_token=0, latencia_por_token=0)
+    buscar = simulador_carteira._buscar_produto
+    buscar("CDB_BTG_DI")
+    print(f"{'instrumentação':>15} {'ms/turno':>9} {'µs/_buscar_produto':>19}")
+    for ativo in (False, True):
+        REGISTRO.ativo = ativo
+        REGISTRO.limpar()
+        inicio = time.perf_counter()
+        for turno in range(args.turnos):
+            for _ in agente.executar_turno(modelo.start_chat(history=[]), [f"Quero investir ({turno})"], funcoes): pass
+        por_turno = (time.perf_counter() - inicio) / args.turnos
+        inicio = time.perf_counter()
+        for _ in range(args.buscas): buscar("CDB_BTG_DI")
+        print(f"{'ligada' if ativo else 'desligada':>15} {por_turno * 1e3:>9.3f} {(time.perf_counter() - inicio) / args.buscas * 1e6:>19.3f}")
+    print(f"\n{'etapa':<45} {'n':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for etapa, valores in REGISTRO.resumo().items():
+        print(f"{etapa:<45} {valores['contagem']:>7} {valores['p50_ms']:>9.3f} {valores['p99_ms']:>9.3f}")
+    if args.prometheus:
+        with open(args.prometheus, "w", encoding="utf-8") as f: f.write(REGISTRO.prometheus())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: f.write(REGISTRO.exportar_json())
+
+
+def bench_precos(args):
+    """Vazão de atualizações de preço (fila e arquivo de ticks) com leitores concorrentes lendo instantâneos."""
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "catalogo.json")
+        _gerar_catalogo(caminho, args.produtos)
+        catalogo = Catalogo(arquivos={"renda_variavel": caminho}, pasta_cache=None)
+        rnd = random.Random(11)
+        ticks = [(f"TK{rnd.randrange(args.produtos):07d}", round(rnd.uniform(0.01, 500), 2)) for _ in range(args.atualizacoes)]
+        arquivo_ticks = os.path.join(pasta, "ticks.txt")
+        with open(arquivo_ticks, "w", encoding="utf-8") as f: f.writelines(f"{t};{p}\n" for t, p in ticks)
+        print(f"{'origem':>8} {'leitores':>9} {'atualizações/s':>15} {'instantâneos':>13} {'leituras/s':>11}")
+        for leitores in args.leitores:
+            for origem in ("fila", "arquivo"):
+                tabela = TabelaPrecos(catalogo)
+                versao_inicial, parar, leituras, erros = tabela.instantaneo.versao, threading.Event(), [0] * leitores, []
+
+                def ler(indice: int):
+                    r, ultima = random.Random(indice), 0
+                    while not parar.is_set():
+                        instantaneo = tabela.instantaneo
+                        if instantaneo.versao < ultima: erros.append("versão regrediu")
+                        ultima = instantaneo.versao
+                        for _ in range(100): instantaneo.preco(f"TK{r.randrange(args.produtos):07d}")
+                        leituras[indice] += 100
+
+                threads = [threading.Thread(target=ler, args=(i,)) for i in range(leitores)]
+                for t in threads: t.start()
+                inicio = time.perf_counter()
+                if origem == "arquivo": ingerir_arquivo(tabela, arquivo_ticks)
+                else:
+                    ingestor = IngestorPrecos(tabela).iniciar()
+                    for i in range(0, len(ticks), args.lote_produtor): ingestor.fila.put(ticks[i:i + args.lote_produtor])
+                    ingestor.parar()
+                duracao = time.perf_counter() - inicio
+                parar.set()
+                for t in threads: t.join()
+                if erros: raise SystemExit(erros[0])
+                ultimo = dict(ticks)
+                if any(tabela.preco(t) != p for t, p in ultimo.items()): raise SystemExit("preço final diferente do último tick")
+                print(f"{origem:>8} {leitores:>9} {len(ticks) / duracao:>15.0f} {tabela.instantaneo.versao - versao_inicial:>13} {sum(leituras) / duracao:>11.0f}")
+
+
+@contextmanager
+def _simulador_isolado(catalogo: Catalogo, armazenamento):
+    """Troca catálogo e armazenamento do simulador (e zera os caches derivados) durante o bloco."""
+    nomes = ("CATALOGO", "ARMAZENAMENTO", "_AVALIADOR", "_MOTOR_RECOMENDACAO", "_TABELA_PRECOS")
+    originais = {nome: getattr(simulador_carteira, nome) for nome in nomes}
+    for nome, valor in zip(nomes, (catalogo, armazenamento, None, None, None)): setattr(simulador_carteira, nome, valor)
+    try: yield
+    finally:
+        for nome, valor in originais.items(): setattr(simulador_carteira, nome, valor)
+
+
+def _gerar_sessao(rnd: random.Random, cliente: str, tickers, operacoes: int):
+    """Sessão sintética de um cliente: questionário, sugestões e um fluxo misto de compras e vendas."""
+    passos = [("iniciar_questionario_perfil", {}),
+              ("responder_questionario_perfil", {**{f"resposta_{i}": rnd.choice("ABC") for i in (1, 2, 3)}, "cliente_id": cliente}),
+              ("obter_perfil_investidor", {"cliente_id": cliente}),
+              ("sugerir_investimentos", {"cliente_id": cliente})]
+    compradas = []
+    for _ in range(operacoes):
+        sorteio = rnd.random()
+        if sorteio < 0.45 or not compradas:
+            ticker = rnd.choice(tickers)
+            compradas.append(ticker)
+            passos.append(("comprar_ativo", {"ticker": ticker, "quantidade": rnd.randint(1, 5), "cliente_id": cliente}))
+        elif sorteio < 0.7: passos.append(("vender_ativo", {"ticker": rnd.choice(compradas), "quantidade": 1, "cliente_id": cliente}))
+        elif sorteio < 0.8: passos.append(("consultar_carteira", {"cliente_id": cliente}))
+        elif sorteio < 0.9: passos.append(("avaliar_carteira", {"cliente_id": cliente}))
+        elif sorteio < 0.95: passos.append(("sugerir_investimentos", {"cliente_id": cliente}))
+        else:
+            ordens = [{"tipo": "compra", "ticker": rnd.choice(tickers), "quantidade": 1} for _ in range(rnd.randint(2, 6))]
+            passos.append(("executar_ordens", {"ordens": ordens, "cliente_id": cliente}))
+    return passos
+
+
+def _gerar_carga(args, tickers):
+    """Passos de todas as sessões, intercalados entre clientes; determinístico pela semente."""
+    sessoes = [_gerar_sessao(random.Random(args.semente * 100_003 + i), f"CARGA-{i:05d}", tickers, args.operacoes) for i in range(args.clientes)]
+    return [passo for rodada in itertools.zip_longest(*sessoes) for passo in rodada if passo]
+
+
+def _estatisticas(duracoes):
+    total = sum(duracoes)
+    return {"chamadas": len(duracoes), "ops_s": round(len(duracoes) / total, 1) if total else 0.0,
+            "p50_ms": round(_percentil(duracoes, 50) * 1e3, 4), "p99_ms": round(_percentil(duracoes, 99) * 1e3, 4)}
+
+
+def _rodar_carga(passos, memoria: bool = False):
+    duracoes, picos, erros = {}, {}, {}
+    if memoria: tracemalloc.start()
+    try:
+        for nome, kwargs in passos:
+            funcao = getattr(simulador_carteira, nome)
+            if memoria:
+                base = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            inicio = time.perf_counter()
+            resposta = funcao(**kwargs)
+            duracao = time.perf_counter() - inicio
+            if memoria: picos.setdefault(nome, []).append(tracemalloc.get_traced_memory()[1] - base)
+            duracoes.setdefault(nome, []).append(duracao)
+            if '"status": "erro"' in resposta: erros[nome] = erros.get(nome, 0) + 1
+    finally:
+        if memoria: tracemalloc.stop()
+    return duracoes, picos, erros
+
+
+_TURNOS_AQUECIMENTO = 10
+_PIORA_MINIMA_MS = 0.05  # abaixo disso a variação é ruído de medição, mesmo se grande em proporção
+
+
+def _comparar(atual, base, tolerancia: float) -> int:
+    """Imprime p50/p99 atuais contra uma execução anterior e retorna quantas métricas pioraram além da tolerância."""
+    regressoes = 0
+    diferentes = [k for k, v in atual["config"].items() if base.get("config", {}).get(k) != v]
+    if diferentes: print(f"\natenção: configuração diferente da base em {', '.join(diferentes)}")
+    print(f"\n{'comparação':<40} {'base':>10} {'atual':>10} {'var.':>8}")
+    for secao in ("ferramentas", "etapas", "agente"):
+        for nome, metricas in atual.get(secao, {}).items():
+            anteriores = base.get(secao, {}).get(nome)
+            if not anteriores: continue
+            for chave in ("p50_ms", "p99_ms"):
+                antes, agora = anteriores.get(chave), metricas.get(chave)
+                if not antes or agora is None: continue
+                variacao = agora / antes - 1
+                piorou = variacao > tolerancia * (2 if chave == "p99_ms" else 1) and agora - antes > _PIORA_MINIMA_MS  # a cauda é mais ruidosa
+                regressoes += piorou
+                print(f"{nome + ' ' + chave:<40} {antes:>10.4f} {agora:>10.4f} {variacao:>+7.0%}{' <- regressão' if piorou else ''}")
+    return regressoes
+
+
+def bench_carga(args):
+    """Sessões sintéticas headless (questionário, sugestões, compras/vendas) e o loop do agente com modelo roteirizado; compara execuções."""
+    resultado = {"config": {k: v for k, v in vars(args).items() if k not in ("saida", "comparar")}}
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "catalogo.json")
+        _gerar_catalogo(caminho, args.produtos, seed=args.semente)
+        catalogo = Catalogo(arquivos={"renda_variavel": caminho}, pasta_cache=None)
+        tickers = [p.ticker for c in catalogo.categorias() for p in catalogo.por_categoria(c)]
+        passos = _gerar_carga(args, tickers)
+        # Repetições com armazenamento novo somam amostras; a última passada, com tracemalloc, só mede memória (ele distorce as latências)
+        duracoes, erros, total = {}, {}, 0.0
+        REGISTRO.limpar()
+        for repeticao in range(args.repeticoes + 1):
+            memoria = repeticao == args.repeticoes
+            armazenamento = criar_armazenamento(args.backend, os.path.join(pasta, f"carga-{repeticao}.{'db' if args.backend == 'sqlite' else 'json'}"))
+            if memoria: REGISTRO.ativo, ativo = False, REGISTRO.ativo
+            with _simulador_isolado(catalogo, armazenamento):
+                inicio = time.perf_counter()
+                rodada, picos, erros = _rodar_carga(passos, memoria)
+                if memoria: REGISTRO.ativo = ativo
+                else:
+                    total += time.perf_counter() - inicio
+                    for nome, valores in rodada.items(): duracoes.setdefault(nome, []).extend(valores)
+        resultado["total"] = {"passos": len(passos) * args.repeticoes, "segundos": round(total, 3), "ops_s": round(len(passos) * args.repeticoes / total, 1)}
+        resultado["ferramentas"] = {nome: {**_estatisticas(d), "erros": erros.get(nome, 0), "pico_kb": round(max(picos.get(nome, [0])) / 1024, 1)}
+                                    for nome, d in sorted(duracoes.items())}
+        resultado["etapas"] = {nome: {"chamadas": m["contagem"], "p50_ms": m["p50_ms"], "p99_ms": m["p99_ms"]}
+                               for nome, m in REGISTRO.resumo().items() if not nome.startswith("simulador_carteira.") or nome.split(".")[-1].startswith("_")}
+
+        if args.turnos_agente:
+            import ferramentas
+            modelo = ModeloLocal(roteiro=roteiro_chamadas, latencia_primeiro_token=0, latencia_por_token=0)
+            armazenamento = criar_armazenamento(args.backend, os.path.join(pasta, f"agente.{'db' if args.backend == 'sqlite' else 'json'}"))
+            rnd, turnos, primeiros = random.Random(args.semente), [], []
+            with _simulador_isolado(catalogo, armazenamento):
+                chat, historico = modelo.start_chat(history=[]), GerenciadorHistorico()
+                restantes = [p for p in passos if p[1].get("cliente_id") == "CARGA-00000" or not p[1]]
+                for turno in range(args.turnos_agente + _TURNOS_AQUECIMENTO):  # os primeiros montam os caches do simulador
+                    if not restantes: restantes = [p for p in passos if p[1].get("cliente_id") == "CARGA-00000" or not p[1]]
+                    n = rnd.randint(1, 3)
+                    lote, restantes = restantes[:n], restantes[n:]
+                    mensagem = json.dumps([{"name": nome, "args": kwargs} for nome, kwargs in lote], ensure_ascii=False)
+                    inicio = time.perf_counter()
+                    for i, _trecho in enumerate(agente.executar_turno(chat, [mensagem], ferramentas.funcoes_disponiveis, cliente_id="CARGA-00000", historico=historico)):
+                        if i == 0: primeiro = time.perf_counter() - inicio
+                    if turno < _TURNOS_AQUECIMENTO: continue
+                    primeiros.append(primeiro)
+                    turnos.append(time.perf_counter() - inicio)
+            resultado["agente"] = {"turno": _estatisticas(turnos), "primeiro_trecho": _estatisticas(primeiros)}
+
+    print(f"{resultado['total']['passos']} passos em {resultado['total']['segundos']:.2f} s ({resultado['total']['ops_s']:.0f} ops/s), backend {args.backend}, {args.produtos} produtos")
+    print(f"{'ferramenta':<36} {'chamadas':>9} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'pico KB':>9} {'erros':>6}")
+    for nome, m in resultado["ferramentas"].items():
+        print(f"{nome:<36} {m['chamadas']:>9} {m['ops_s']:>9.0f} {m['p50_ms']:>9.3f} {m['p99_ms']:>9.3f} {m.get('pico_kb', 0):>9.1f} {m['erros']:>6}")
+    for nome, m in resultado["etapas"].items(): print(f"{nome:<36} {m['chamadas']:>9} {'':>9} {m['p50_ms']:>9.3f} {m['p99_ms']:>9.3f}")
+    if "agente" in resultado:
+        for nome, m in resultado["agente"].items(): print(f"{'agente.' + nome:<36} {m['chamadas']:>9} {m['ops_s']:>9.0f} {m['p50_ms']:>9.3f} {m['p99_ms']:>9.3f}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f: json.dump(resultado, f, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f: base = json.load(f)
+        regressoes = _comparar(resultado, base, args.tolerancia)
+        if regressoes: raise SystemExit(f"{regressoes} métricas pioraram mais de {args.tolerancia:.0%}")
+
+
+def bench_servico(args):
+    """Vazão do pool de processos do agente (modelo local com latência fixa) conforme o número de trabalhadores, sem perder operações."""
+    print(f"{args.clientes} clientes x {args.turnos} turnos, modelo local com {args.latencia_modelo * 1e3:.0f} ms por chamada, backend sqlite")
+    print(f"{'trabalhadores':>13} {'turnos/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'recusas':>8} {'aceleração':>11}")
+    base = None
+    for trabalhadores in args.trabalhadores:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "servico.db")
+            # Os trabalhadores (spawn) herdam o ambiente e abrem o mesmo banco; a transação do SQLite serializa entre processos
+            os.environ.update(CARTEIRA_BACKEND="sqlite", CARTEIRA_CAMINHO=caminho)
+            opcoes = {"roteiro": roteiro_chamadas, "latencia_primeiro_token": args.latencia_modelo, "latencia_por_token": 0}
+            duracoes, recusas, erros = [], [0], []
+
+            # Como o Gemini, o modelo não informa cliente_id: o agente usa o cliente do turno, que o serviço recebe em `enviar`
+            mensagem = json.dumps([{"name": "comprar_ativo", "args": {"ticker": args.ticker, "quantidade": 1}},
+                                   {"name": "consultar_carteira", "args": {}}])
+
+            def cliente(indice: int):
+                cliente_id = f"SERVICO-{indice:04d}"
+                for _ in range(args.turnos):
+                    inicio = time.perf_counter()
+                    while True:
+                        try:
+                            resposta = "".join(servico.enviar(cliente_id, cliente_id, [mensagem]))
+                            break
+                        except ServicoOcupado:
+                            recusas[0] += 1
+                            time.sleep(0.01)
+                    duracoes.append(time.perf_counter() - inicio)
+                    if "Executei 2" not in resposta: erros.append(resposta)
+
+            with ServicoAgente(trabalhadores, fabrica="modelo_local:ModeloLocal", opcoes_modelo=opcoes, limite_fila=args.limite_fila) as servico:
+                servico.aguardar_prontos(120)
+                threads = [threading.Thread(target=cliente, args=(i,)) for i in range(args.clientes)]
+                inicio = time.perf_counter()
+                for t in threads: t.start()
+                for t in threads: t.join()
+                duracao = time.perf_counter() - inicio
+            if erros: raise SystemExit(f"turno com resposta inesperada: {erros[0]}")
+            armazenamento = criar_armazenamento("sqlite", caminho)
+            for i in range(args.clientes):
+                dados = armazenamento.carregar(f"SERVICO-{i:04d}")
+                quantidade = sum(a.get("quantidade", 0) for a in dados["carteira_investimentos"] if a["ticker"] == args.ticker)
+                if quantidade != args.turnos: raise SystemExit(f"cliente {i}: {quantidade} compras registradas de {args.turnos}")
+        vazao = len(duracoes) / duracao
+        base = base or vazao
+        print(f"{trabalhadores:>13} {vazao:>10.1f} {_percentil(duracoes, 50) * 1e3:>9.1f} {_percentil(duracoes, 99) * 1e3:>9.1f} {recusas[0]:>8} {vazao / base:>10.1f}x")
+
+
+def _posicoes_sinteticas(quantidade: int, seed: int = 7):
+    rnd = random.Random(seed)
+    posicoes = []
+    for i in range(quantidade):
+        if i % 4:
+            qtd = rnd.randint(1, 500)
+            custo = round(qtd * rnd.uniform(1, 200), 2)
+            posicoes.append({"ticker": f"TK{i:07d}", "descricao": f"Ativo sintético {i}", "categoria": "renda_variavel",
+                             "quantidade": qtd, "valor_total": custo, "preco_medio": custo / qtd})
+        else: posicoes.append({"ticker": f"RF{i:07d}", "descricao": f"CDB sintético {i}", "categoria": "renda_fixa", "valor_aplicado": round(rnd.uniform(100, 1e5), 2)})
+    return posicoes
+
+
+def bench_posicoes(args):
+    """Carteira com milhares de posições: memória, busca por ticker e serialização de dicts vs. Carteira, e deriva do saldo em float vs. centavos."""
+    print(f"{'posições':>9} {'forma':<9} {'memória KB':>11} {'busca µs':>9} {'serializado KB':>15} {'gravar ms':>10} {'ler ms':>8}")
+    for quantidade in args.posicoes:
+        posicoes = _posicoes_sinteticas(quantidade)
+        dados = {"cliente_id": "BENCH", "nome_cliente": None, "perfil_investidor": "Moderado", "saldo_conta_corrente": SALDO_INICIAL, "carteira_investimentos": posicoes}
+        tickers = [p["ticker"] for p in random.Random(1).choices(posicoes, k=args.buscas)]
+        texto = json.dumps(dados)
+        tracemalloc.start()
+        antes = tracemalloc.get_traced_memory()[0]
+        como_dicts = json.loads(texto)
+        memoria_dicts = tracemalloc.get_traced_memory()[0] - antes
+        antes = tracemalloc.get_traced_memory()[0]
+        carteira = Carteira.de_dados(como_dicts)
+        memoria_carteira = tracemalloc.get_traced_memory()[0] - antes
+        tracemalloc.stop()
+
+        lista = como_dicts["carteira_investimentos"]
+        inicio = time.perf_counter()
+        for ticker in tickers: next((a for a in lista if a["ticker"].upper() == ticker.upper()), None)
+        busca_dicts = (time.perf_counter() - inicio) / len(tickers)
+        inicio = time.perf_counter()
+        for ticker in tickers: carteira.posicao(ticker)
+        busca_carteira = (time.perf_counter() - inicio) / len(tickers)
+
+        binario = carteira.para_bytes()
+        formas = (("dicts", memoria_dicts, busca_dicts, len(texto), lambda: json.dumps(como_dicts), lambda: json.loads(texto)),
+                  ("carteira", memoria_carteira, busca_carteira, len(binario), carteira.para_bytes, lambda: Carteira.de_bytes(binario)))
+        for nome, memoria, busca, tamanho, gravar, ler in formas:
+            tempo_gravar = min(_cronometrar(gravar) for _ in range(args.rodadas))
+            tempo_ler = min(_cronometrar(ler) for _ in range(args.rodadas))
+            print(f"{quantidade:>9} {nome:<9} {memoria / 1024:>11.0f} {busca * 1e6:>9.2f} {tamanho / 1024:>15.0f} {tempo_gravar * 1e3:>10.2f} {tempo_ler * 1e3:>8.2f}")
+        if Carteira.de_bytes(binario).para_dados() != carteira.para_dados(): raise SystemExit("formato binário não preserva a carteira")
+
+    # Ciclos de compra e venda do mesmo valor, a venda em duas parcelas: em float o saldo deriva, em centavos volta exato
+    saldo_float, saldo_centavos, rnd = SALDO_INICIAL, para_centavos(SALDO_INICIAL), random.Random(3)
+    for _ in range(args.ciclos):
+        valor = round(rnd.uniform(0.01, 999.99), 2)
+        parcela = round(valor * rnd.random(), 2)
+        saldo_float = saldo_float - valor + parcela + (valor - parcela)
+        saldo_centavos = saldo_centavos - para_centavos(valor) + para_centavos(parcela) + (para_centavos(valor) - para_centavos(parcela))
+    print(f"\n{args.ciclos} ciclos de compra e venda em duas parcelas: saldo em float {saldo_float!r}, em centavos {saldo_centavos / 100!r}")
+
+
+def _cronometrar(funcao) -> float:
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+
+CENARIOS = {
+    "catalogo": bench_catalogo,
+    "persistencia": bench_persistencia,
+    "diario": bench_diario,
+    "avaliacao": bench_avaliacao,
+    "agente": bench_agente,
+    "recomendacao": bench_recomendacao,
+    "inicializacao": bench_inicializacao,
+    "historico": bench_historico,
+    "ordens": bench_ordens,
+    "audio": bench_audio,
+    "instrumentacao": bench_instrumentacao,
+    "precos": bench_precos,
+    "carga": bench_carga,
+    "servico": bench_servico,
+    "posicoes": bench_posicoes,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do simulador de carteira.")
+    sub = parser.add_subparsers(dest="cenario", required=True)
+    p = sub.add_parser("catalogo", help=bench_catalogo.__doc__)
+    p.add_argument("--tamanhos", type=int, nargs="+", default=[100, 10_000, 100_000, 1_000_000])
+    p.add_argument("--buscas", type=int, default=100_000)
+    p = sub.add_parser("persistencia", help=bench_persistencia.__doc__)
+    p.add_argument("--backends", nargs="+", default=["legado", "json", "sqlite"])
+    p.add_argument("--threads", type=int, default=16)
+    p.add_argument("--clientes", type=int, default=8)
+    p.add_argument("--ops", type=int, default=250)
+    p = sub.add_parser("diario", help=bench_diario.__doc__)
+    p.add_argument("--appends", type=int, default=2000)
+    p.add_argument("--eventos", type=int, default=10_000_000)
+    p.add_argument("--clientes", type=int, default=10_000)
+    p.add_argument("--eventos-por-snapshot", type=int, default=50_000)
+    p = sub.add_parser("avaliacao", help=bench_avaliacao.__doc__)
+    p.add_argument("--carteiras", type=int, default=100_000)
+    p.add_argument("--posicoes", type=int, default=8)
+    p.add_argument("--rodadas", type=int, default=20)
+    p = sub.add_parser("agente", help=bench_agente.__doc__)
+    p.add_argument("--turnos", type=int, default=10)
+    p.add_argument("--latencia-modelo", type=float, default=0.3, help="segundos até o primeiro token do modelo local")
+    p.add_argument("--latencia-token", type=float, default=0.01)
+    p.add_argument("--latencia-ferramenta", type=float, default=0.05)
+    p = sub.add_parser("recomendacao", help=bench_recomendacao.__doc__)
+    p.add_argument("--produtos", type=int, default=1_000_000)
+    p.add_argument("--chamadas", type=int, default=10_000)
+    p = sub.add_parser("inicializacao", help=bench_inicializacao.__doc__)
+    p.add_argument("--reruns", type=int, default=20)
+    p = sub.add_parser("historico", help=bench_historico.__doc__)
+    p.add_argument("--turnos", type=int, default=200)
+    p = sub.add_parser("ordens", help=bench_ordens.__doc__)
+    p.add_argument("--backends", nargs="+", default=["json", "sqlite", "diario"])
+    p.add_argument("--ordens", type=int, default=50)
+    p.add_argument("--rodadas", type=int, default=20)
+    p = sub.add_parser("audio", help=bench_audio.__doc__)
+    p.add_argument("--duracoes", type=int, nargs="+", default=[10, 60, 300], help="segundos de áudio WAV 44,1 kHz estéreo")
+    p.add_argument("--latencia-modelo", type=float, default=0.3)
+    p.add_argument("--latencia-por-mb", type=float, default=0.08, help="segundos para enviar 1 MB ao modelo")
+    p = sub.add_parser("instrumentacao", help=bench_instrumentacao.__doc__)
+    p.add_argument("--turnos", type=int, default=500)
+    p.add_argument("--buscas", type=int, default=200_000)
+    p.add_argument("--prometheus", help="grava as métricas neste arquivo, no formato do Prometheus")
+    p.add_argument("--json", help="grava as métricas e perfis neste arquivo JSON")
+    p = sub.add_parser("precos", help=bench_precos.__doc__)
+    p.add_argument("--produtos", type=int, default=100_000)
+    p.add_argument("--atualizacoes", type=int, default=2_000_000)
+    p.add_argument("--leitores", type=int, nargs="+", default=[0, 4])
+    p.add_argument("--lote-produtor", type=int, default=1000, help="ticks por item publicado na fila")
+    p = sub.add_parser("carga", help=bench_carga.__doc__)
+    p.add_argument("--clientes", type=int, default=200)
+    p.add_argument("--operacoes", type=int, default=40, help="compras/vendas/consultas por sessão, após o questionário")
+    p.add_argument("--produtos", type=int, default=100_000)
+    p.add_argument("--backend", choices=["json", "sqlite", "diario", "binario"], default="sqlite")
+    p.add_argument("--turnos-agente", type=int, default=500, help="turnos do loop do agente com o modelo roteirizado (0 desliga)")
+    p.add_argument("--semente", type=int, default=1)
+    p.add_argument("--repeticoes", type=int, default=3, help="passadas de medição de latência, cada uma com armazenamento novo")
+    p.add_argument("--saida", help="grava o resultado neste arquivo JSON")
+    p.add_argument("--comparar", help="JSON de uma execução anterior; sai com erro se o p50 (ou o p99, com o dobro da tolerância) piorar")
+    p.add_argument("--tolerancia", type=float, default=0.25)
+    p = sub.add_parser("servico", help=bench_servico.__doc__)
+    p.add_argument("--trabalhadores", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--clientes", type=int, default=32, help="clientes simultâneos, cada um com sua sessão")
+    p.add_argument("--turnos", type=int, default=20, help="turnos por cliente; cada um compra 1 unidade e consulta a carteira")
+    p.add_argument("--latencia-modelo", type=float, default=0.05, help="segundos por chamada ao modelo local (duas por turno)")
+    p.add_argument("--limite-fila", type=int, default=8, help="turnos aguardando por trabalhador antes de recusar")
+    p.add_argument("--ticker", default="ASAI3")
+    p = sub.add_parser("posicoes", help=bench_posicoes.__doc__)
+    p.add_argument("--posicoes", type=int, nargs="+", default=[100, 1000, 10_000])
+    p.add_argument("--buscas", type=int, default=2000)
+    p.add_argument("--rodadas", type=int, default=5)
+    p.add_argument("--ciclos", type=int, default=100_000)
+    args = parser.parse_args()
+    CENARIOS[args.cenario](args)
@@ -0,0 +1,245 @@
+import copy
+import os
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import quote, unquote
+
+from armazenamento import Armazenamento, _copiar_modo, cliente_novo
+from catalogo import CATEGORIAS_VARIAVEIS
+
+try: import fcntl
+except ImportError: fcntl = None
+
+# Representação compacta da carteira de um cliente: posições tipadas com
+# __slots__, índice ticker -> posição e dinheiro em centavos inteiros (compras
+# e vendas repetidas não acumulam erro de ponto flutuante). Os dicts do
+# armazenamento continuam no formato do carteira.json (reais em float); a
+# conversão acontece na entrada e na saída de cada operação.
+
+MAGIA = b"CRT1"
+_CABECALHO = struct.Struct("<4sBqI")  # magia, flags do cliente, saldo em centavos, número de posições
+_POSICAO = struct.Struct("<Bdqd")  # flags, quantidade, centavos, preço médio
+_SEM_NOME, _SEM_PERFIL = 1, 2
+_VARIAVEL, _COM_PRECO_MEDIO, _SEM_DESCRICAO, _SEM_CATEGORIA = 1, 2, 4, 8
+_SEPARADOR = "\0"
+
+
+def para_centavos(valor: float) -> int:
+    return int(round(float(valor) * 100))
+
+
+def para_reais(centavos: int) -> float:
+    return centavos / 100
+
+
+def _quantidade(valor: Any):
+    """Quantidade como int quando inteira; frações de dados antigos são mantidas, nunca truncadas."""
+    numero = float(valor)
+    return int(numero) if numero.is_integer() else numero
+
+
+class Posicao:
+    """
+    Uma posição da carteira. Renda variável e cripto têm `quantidade` e custo
+    (`centavos`, o antigo valor_total); renda fixa e fundos têm só o valor
+    aplicado em `centavos` e `quantidade` None. Quantidades são inteiras; frações
+    só aparecem em carteiras gravadas antes da validação e são preservadas.
+    """
+    __slots__ = ("ticker", "descricao", "categoria", "quantidade", "centavos", "preco_medio")
+
+    def __init__(self, ticker: str, descricao: Optional[str], categoria: Optional[str], quantidade: Optional[int], centavos: int, preco_medio: Optional[float] = None):
+        self.ticker, self.descricao, self.categoria = ticker, descricao, categoria
+        self.quantidade, self.centavos, self.preco_medio = quantidade, centavos, preco_medio
+
+    @property
+    def variavel(self) -> bool:
+        return self.quantidade is not None
+
+    @property
+    def zerada(self) -> bool:
+        return self.quantidade <= 0 if self.variavel else self.centavos < 1
+
+    @classmethod
+    def nova(cls, ticker: str, descricao: str, categoria: str) -> "Posicao":
+        variavel = categoria in CATEGORIAS_VARIAVEIS
+        return cls(ticker, descricao, categoria, 0 if variavel else None, 0)
+
+    @classmethod
+    def de_dict(cls, posicao: Dict[str, Any]) -> "Posicao":
+        if "quantidade" in posicao:
+            return cls(posicao["ticker"], posicao.get("descricao"), posicao.get("categoria"), _quantidade(posicao["quantidade"]),
+                       para_centavos(posicao.get("valor_total", 0)), posicao.get("preco_medio"))
+        return cls(posicao["ticker"], posicao.get("descricao"), posicao.get("categoria"), None, para_centavos(posicao.get("valor_aplicado", 0)))
+
+    def para_dict(self) -> Dict[str, Any]:
+        posicao = {"ticker": self.ticker, "descricao": self.descricao, "categoria": self.categoria}
+        if not self.variavel:
+            posicao["valor_aplicado"] = para_reais(self.centavos)
+            return posicao
+        posicao.update({"quantidade": self.quantidade, "valor_total": para_reais(self.centavos)})
+        if self.preco_medio is not None: posicao["preco_medio"] = self.preco_medio
+        return posicao
+
+
+class Carteira:
+    """
+    Cliente, saldo (centavos) e posições numa lista contígua, com um dict
+    ticker -> índice para busca O(1). Remover preserva a ordem das posições
+    (a ordem em que aparecem para o cliente) e reindexa só as seguintes.
+    """
+
+    def __init__(self, cliente_id: str, saldo_centavos: int = 0, nome_cliente: str = None, perfil_investidor: str = None,
+                 posicoes: List[Posicao] = None):
+        self.cliente_id, self.nome_cliente, self.perfil_investidor = cliente_id, nome_cliente, perfil_investidor
+        self.saldo_centavos = saldo_centavos
+        self._posicoes: List[Posicao] = []
+        self._indice: Dict[str, int] = {}
+        for posicao in posicoes or []: self.adicionar(posicao)
+
+    @property
+    def saldo(self) -> float:
+        return para_reais(self.saldo_centavos)
+
+    def __len__(self) -> int:
+        return len(self._posicoes)
+
+    def __iter__(self) -> Iterator[Posicao]:
+        return iter(self._posicoes)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker.upper() in self._indice
+
+    def posicao(self, ticker: str) -> Optional[Posicao]:
+        indice = self._indice.get(ticker.upper())
+        return None if indice is None else self._posicoes[indice]
+
+    def adicionar(self, posicao: Posicao) -> Posicao:
+        chave = posicao.ticker.upper()
+        if chave in self._indice: raise ValueError(f"Posição duplicada para '{posicao.ticker}'.")
+        self._indice[chave] = len(self._posicoes)
+        self._posicoes.append(posicao)
+        return posicao
+
+    def remover(self, ticker: str) -> Optional[Posicao]:
+        indice = self._indice.pop(ticker.upper(), None)
+        if indice is None: return None
+        posicao = self._posicoes.pop(indice)
+        for i in range(indice, len(self._posicoes)): self._indice[self._posicoes[i].ticker.upper()] = i
+        return posicao
+
+    @classmethod
+    def de_dados(cls, dados: Dict[str, Any]) -> "Carteira":
+        """Monta a carteira a partir do dict do armazenamento (sem compartilhar objetos mutáveis com ele)."""
+        return cls(dados["cliente_id"], para_centavos(dados.get("saldo_conta_corrente", 0)), dados.get("nome_cliente"),
+                   dados.get("perfil_investidor"), [Posicao.de_dict(p) for p in dados.get("carteira_investimentos", [])])
+
+    def para_dados(self) -> Dict[str, Any]:
+        return {"cliente_id": self.cliente_id, "nome_cliente": self.nome_cliente, "perfil_investidor": self.perfil_investidor,
+                "saldo_conta_corrente": self.saldo, "carteira_investimentos": [p.para_dict() for p in self._posicoes]}
+
+    def atualizar(self, dados: Dict[str, Any]):
+        """Grava saldo e posições de volta no dict da transação."""
+        dados["saldo_conta_corrente"] = self.saldo
+        dados["carteira_investimentos"] = [p.para_dict() for p in self._posicoes]
+
+    def para_bytes(self) -> bytes:
+        """
+        Formato binário: cabeçalho (magia, flags, saldo em centavos, nº de
+        posições), um registro fixo de 25 bytes por posição (flags, quantidade,
+        centavos, preço médio) e, por fim, os textos (cliente, nome, perfil e
+        ticker/descrição/categoria de cada posição) num bloco UTF-8 separado por NUL.
+        """
+        flags = (_SEM_NOME if self.nome_cliente is None else 0) | (_SEM_PERFIL if self.perfil_investidor is None else 0)
+        partes = [_CABECALHO.pack(MAGIA, flags, self.saldo_centavos, len(self._posicoes))]
+        textos = [self.cliente_id, self.nome_cliente or "", self.perfil_investidor or ""]
+        for p in self._posicoes:
+            flags = ((_VARIAVEL if p.variavel else 0) | (_COM_PRECO_MEDIO if p.preco_medio is not None else 0)
+                     | (_SEM_DESCRICAO if p.descricao is None else 0) | (_SEM_CATEGORIA if p.categoria is None else 0))
+            partes.append(_POSICAO.pack(flags, p.quantidade or 0.0, p.centavos, p.preco_medio or 0.0))
+            textos += (p.ticker, p.descricao or "", p.categoria or "")
+        bloco = _SEPARADOR.join(textos)
+        if bloco.count(_SEPARADOR) != len(textos) - 1: raise ValueError("Textos da carteira não podem conter o caractere NUL.")
+        partes.append(bloco.encode("utf-8"))
+        return b"".join(partes)
+
+    @classmethod
+    def de_bytes(cls, dados: bytes) -> "Carteira":
+        magia, flags, saldo, total = _CABECALHO.unpack_from(dados, 0)
+        if magia != MAGIA: raise ValueError("Arquivo de carteira em formato desconhecido.")
+        fim_registros = _CABECALHO.size + total * _POSICAO.size
+        textos = dados[fim_registros:].decode("utf-8").split(_SEPARADOR)
+        carteira = cls(textos[0], saldo, None if flags & _SEM_NOME else textos[1], None if flags & _SEM_PERFIL else textos[2])
+        posicoes, indice = carteira._posicoes, carteira._indice
+        registros = struct.iter_unpack(_POSICAO.format, dados[_CABECALHO.size:fim_registros])
+        for i, (flags, quantidade, centavos, preco_medio) in enumerate(registros):
+            ticker, descricao, categoria = textos[3 + 3 * i: 6 + 3 * i]
+            indice[ticker.upper()] = i
+            posicoes.append(Posicao(ticker, None if flags & _SEM_DESCRICAO else descricao, None if flags & _SEM_CATEGORIA else categoria,
+                                    _quantidade(quantidade) if flags & _VARIAVEL else None, centavos, preco_medio if flags & _COM_PRECO_MEDIO else None))
+        return carteira
+
+
+class ArmazenamentoBinario(Armazenamento):
+    """
+    Backend com um arquivo binário (Carteira.para_bytes) por cliente. Ler ou
+    gravar um cliente não toca nos demais; cada gravação troca o arquivo de
+    forma atômica, sob um lock de arquivo por cliente entre processos.
+    """
+
+    def __init__(self, pasta: str = "carteiras_bin"):
+        self.pasta = pasta
+        self._travas: Dict[str, threading.Lock] = {}
+        self._trava = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, cliente_id: str) -> str:
+        return os.path.join(self.pasta, quote(cliente_id, safe="") + ".bin")
+
+    @contextmanager
+    def _bloqueio(self, cliente_id: str):
+        with self._trava: trava = self._travas.setdefault(cliente_id, threading.Lock())
+        with trava:
+            if fcntl is None:
+                yield
+                return
+            with open(self._caminho(cliente_id) + ".lock", "a") as arquivo:
+                fcntl.flock(arquivo, fcntl.LOCK_EX)
+                try: yield
+                finally: fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+    def _ler(self, cliente_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._caminho(cliente_id), "rb") as f: return Carteira.de_bytes(f.read()).para_dados()
+        except FileNotFoundError:
+            return None
+
+    def _gravar(self, dados: Dict[str, Any]):
+        conteudo = Carteira.de_dados(dados).para_bytes()
+        fd, temporario = tempfile.mkstemp(dir=self.pasta, prefix=".carteira-", suffix=".tmp")
+        try:
+            _copiar_modo(temporario, self._caminho(dados["cliente_id"]))
+            with os.fdopen(fd, "wb") as f:
+                f.write(conteudo)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self._caminho(dados["cliente_id"]))
+        except BaseException:
+            if os.path.exists(temporario): os.remove(temporario)
+            raise
+
+    def carregar(self, cliente_id: str) -> Dict[str, Any]:
+        return self._ler(cliente_id) or cliente_novo(cliente_id)
+
+    def clientes(self) -> List[str]:
+        return sorted(unquote(nome[:-4]) for nome in os.listdir(self.pasta) if nome.endswith(".bin"))
+
+    @contextmanager
+    def transacao(self, cliente_id: str, operacao: str = "ajuste", execucoes: List[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        with self._bloqueio(cliente_id):
+            original = self._ler(cliente_id)
+            dados = copy.deepcopy(original) if original else cliente_novo(cliente_id)
+            yield dados
+            if dados != original: self._gravar(dados)
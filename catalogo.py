@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+CATEGORIAS_VARIAVEIS = ("renda_variavel", "criptomoedas")
+PERFIL_PADRAO_VARIAVEL = ("Arrojado",)
+INTERVALO_VERIFICACAO = 2.0  # segundos entre checagens de mtime dos arquivos
+PASTA_CACHE = ".cache_catalogo"
+
+ARQUIVOS_CATALOGO = {
+    "renda_variavel": "catalogo_final.json",
+    "criptomoedas": "catalogo_cripto.json",
+}
+
+PRODUTOS_FIXOS = {
+    "renda_fixa": [
+        {"ticker": "CDB_BTG_DI", "descricao": "CDB Pós-Fixado BTG 105% CDI.", "perfil": ["Conservador", "Moderado"]},
+        {"ticker": "LCI_BTG_360", "descricao": "LCI BTG 1 ano 98% CDI.", "perfil": ["Conservador", "Moderado"]},
+        {"ticker": "TESOURO_SELIC_2029", "descricao": "Tesouro Selic 2029.", "perfil": ["Conservador"]},
+    ],
+    "fundos": [
+        {"ticker": "FUNDO_RF_BTG", "descricao": "Fundo de Renda Fixa BTG.", "perfil": ["Conservador", "Moderado"]},
+        {"ticker": "FUNDO_MM_BTG", "descricao": "Fundo Multimercado BTG.", "perfil": ["Moderado", "Arrojado"]},
+        {"ticker": "FUNDO_ACOES_BTG_ABSOLUTO", "descricao": "Fundo de Ações BTG Pactual Absoluto.", "perfil": ["Arrojado"]},
+    ],
+}
+
+
+class Produto(NamedTuple):
+    """Registro imutável de um produto do catálogo, com o preço já convertido."""
+    ticker: str
+    descricao: str
+    categoria: str
+    perfil: Tuple[str, ...]
+    preco: Optional[float]  # None quando o 'Preco' do arquivo é inválido
+
+    def para_dict(self) -> Dict[str, Any]:
+        return {"ticker": self.ticker, "descricao": self.descricao, "categoria": self.categoria,
+                "perfil": list(self.perfil), "Preco": self.preco}
+
+
+def converter_preco(valor: Any) -> Optional[float]:
+    """Aceita '0,08', '1.5' ou números; ausente vale 1.0 (produtos por valor aplicado)."""
+    if valor is None: return 1.0
+    try: return float(str(valor).replace(",", "."))
+    except (ValueError, TypeError): return None
+
+
+def _criar_produto(bruto: Dict[str, Any], categoria: str) -> Produto:
+    perfil = bruto.get("perfil") or (PERFIL_PADRAO_VARIAVEL if categoria in CATEGORIAS_VARIAVEIS else ())
+    return Produto(str(bruto["ticker"]), bruto.get("descricao", ""), categoria, tuple(perfil), converter_preco(bruto.get("Preco")))
+
+
+def _ler_cache(cache: str, chave: List[Any], categoria: str) -> Optional[Tuple[Produto, ...]]:
+    try:
+        with open(cache, "r", encoding="utf-8") as f: dados = json.load(f)
+        if dados["chave"] != chave: return None
+        return tuple(Produto(str(t), str(d), categoria, tuple(map(str, perfil)), None if preco is None else float(preco))
+                     for t, d, perfil, preco in dados["produtos"])
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+
+
+def _ler_arquivo(caminho: str, categoria: str, pasta_cache: Optional[str]) -> Tuple[Tuple[Produto, ...], int]:
+    """
+    Lê um arquivo de catálogo. Com pasta_cache, os produtos já convertidos ficam
+    num JSON de listas simples (nunca pickle: o cache não pode executar código),
+    chaveado por caminho, categoria, mtime e tamanho do arquivo, e as cargas
+    seguintes pulam a conversão dos produtos. Retorna os produtos e o mtime lido.
+    """
+    info = os.stat(caminho)
+    chave = [os.path.abspath(caminho), categoria, info.st_mtime_ns, info.st_size]
+    cache = None
+    if pasta_cache:
+        cache = os.path.join(pasta_cache, hashlib.sha1(repr(chave[:2]).encode("utf-8")).hexdigest()[:16] + ".json")
+        produtos = _ler_cache(cache, chave, categoria)
+        if produtos is not None: return produtos, info.st_mtime_ns
+    with open(caminho, "r", encoding="utf-8") as f: produtos = tuple(_criar_produto(p, categoria) for p in json.load(f))
+    if cache:
+        try:
+            os.makedirs(pasta_cache, exist_ok=True)
+            temporario = f"{cache}.{os.getpid()}.tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({"chave": chave, "produtos": [[p.ticker, p.descricao, p.perfil, p.preco] for p in produtos]}, f, ensure_ascii=False)
+            os.replace(temporario, cache)
+        except OSError:
+            pass  # sem cache em disco, só perde a aceleração da próxima carga
+    return produtos, info.st_mtime_ns
+
+
+class Catalogo:
+    """
+    Catálogo de produtos indexado, montado uma vez no carregamento.
+    Mantém um índice hash por ticker (sem distinção de maiúsculas) e índices
+    secundários por categoria e por perfil. Cada arquivo só é lido quando sua
+    categoria é usada pela primeira vez (uma busca por ticker precisa de todas).
+    Quando um arquivo muda em disco, apenas a categoria correspondente é reindexada,
+    em índices novos trocados de uma vez; as leituras não usam trava.
+    """
+
+    def __init__(self, arquivos: Dict[str, str] = None, fixos: Dict[str, List[Dict[str, Any]]] = None, pasta_cache: Optional[str] = PASTA_CACHE):
+        self._arquivos = dict(ARQUIVOS_CATALOGO if arquivos is None else arquivos)
+        self._pasta_cache = pasta_cache
+        self._por_categoria: Dict[str, Tuple[Produto, ...]] = {}
+        self._por_ticker: Dict[str, Produto] = {}
+        self._por_perfil: Dict[str, Dict[str, Tuple[Produto, ...]]] = {}
+        self._perfil_cache: Dict[str, Tuple[Produto, ...]] = {}
+        self._mtimes: Dict[str, int] = {}
+        self._ultima_verificacao = 0.0
+        self._versao = 0  # incrementada a cada reindexação, para caches derivados do catálogo
+        self._trava = threading.RLock()  # uma reindexação por vez; leitores não travam
+        for categoria, produtos in (PRODUTOS_FIXOS if fixos is None else fixos).items():
+            self._indexar(categoria, tuple(_criar_produto(p, categoria) for p in produtos))
+        self._categorias = list(self._por_categoria) + [c for c in self._arquivos if c not in self._por_categoria]
+
+    def _indexar(self, categoria: str, produtos: Tuple[Produto, ...]):
+        """Monta índices novos e os publica por atribuição: leitores em outras threads veem o catálogo antigo ou o novo, nunca um meio-termo."""
+        por_ticker = dict(self._por_ticker)
+        for p in self._por_categoria.get(categoria, ()):
+            chave = p.ticker.upper()
+            if por_ticker.get(chave) is p: del por_ticker[chave]
+        for p in produtos: por_ticker.setdefault(p.ticker.upper(), p)
+        por_perfil = {perfil: {c: lista for c, lista in por_categoria.items() if c != categoria} for perfil, por_categoria in self._por_perfil.items()}
+        agrupados: Dict[str, List[Produto]] = {}
+        for p in produtos:
+            for perfil in p.perfil: agrupados.setdefault(perfil, []).append(p)
+        for perfil, lista in agrupados.items():
+            por_perfil.setdefault(perfil, {})[categoria] = tuple(lista)
+        self._por_categoria = {**self._por_categoria, categoria: produtos}
+        self._por_ticker, self._por_perfil = por_ticker, por_perfil
+        self._perfil_cache = {}  # por último: quem lê o cache novo já vê _por_perfil novo
+        self._versao += 1
+
+    def _carregar(self, categoria: str):
+        with self._trava:
+            try: produtos, mtime = _ler_arquivo(self._arquivos[categoria], categoria, self._pasta_cache)
+            except FileNotFoundError: produtos, mtime = (), None
+            self._indexar(categoria, produtos)
+            self._mtimes[categoria] = mtime
+
+    def _garantir(self, categoria: str = None):
+        """Carrega a categoria pedida (ou todas) se ainda não foi lida; depois verifica alterações periodicamente."""
+        pendentes = [c for c in ([categoria] if categoria else self._arquivos) if c in self._arquivos and c not in self._mtimes]
+        if pendentes:
+            with self._trava:  # a primeira carga roda na thread de quem pediu; as demais esperam por ela
+                for c in pendentes:
+                    if c not in self._mtimes: self._carregar(c)
+        if not pendentes and time.monotonic() - self._ultima_verificacao >= INTERVALO_VERIFICACAO: self.recarregar()
+
+    def recarregar(self) -> List[str]:
+        """Reindexa as categorias já carregadas cujo arquivo mudou. Retorna as categorias recarregadas."""
+        with self._trava:
+            self._ultima_verificacao = time.monotonic()
+            recarregadas = []
+            for categoria, mtime_carregado in list(self._mtimes.items()):
+                try: mtime = os.stat(self._arquivos[categoria]).st_mtime_ns
+                except FileNotFoundError: continue
+                if mtime == mtime_carregado: continue
+                self._carregar(categoria)
+                recarregadas.append(categoria)
+            return recarregadas
+
+    def buscar(self, ticker: str) -> Optional[Produto]:
+        self._garantir()
+        return self._por_ticker.get(ticker.upper())
+
+    def categorias(self) -> List[str]:
+        return list(self._categorias)
+
+    def por_categoria(self, categoria: str) -> Tuple[Produto, ...]:
+        self._garantir(categoria)
+        return self._por_categoria.get(categoria, ())
+
+    def por_perfil(self, perfil: str) -> Tuple[Produto, ...]:
+        """Produtos adequados ao perfil, na ordem das categorias do catálogo."""
+        self._garantir()
+        cache = self._perfil_cache  # lido antes de _por_perfil (a ordem inversa da publicação em _indexar)
+        if perfil not in cache:
+            por_categoria = self._por_perfil.get(perfil, {})
+            cache[perfil] = tuple(p for c in self._categorias for p in por_categoria.get(c, ()))
+        return cache[perfil]
+
+    @property
+    def versao(self) -> int:
+        self._garantir()
+        return self._versao
+
+    def __len__(self) -> int:
+        self._garantir()
+        return len(self._por_ticker)
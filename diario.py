@@ -0,0 +1,164 @@
+import copy
+import glob
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from armazenamento import Armazenamento, _gravar_json_atomico, cliente_novo
+
+try: import fcntl
+except ImportError: fcntl = None
+
+EVENTOS_POR_SNAPSHOT = 50_000
+ARQUIVO_SNAPSHOT = "snapshot.json"
+_CAMPOS_CLIENTE = {"nome_cliente": "nome", "perfil_investidor": "perfil", "saldo_conta_corrente": "saldo"}
+
+
+def _segmento(pasta: str, numero: int) -> str:
+    return os.path.join(pasta, f"eventos.{numero:08d}.log")
+
+
+def _numero_segmento(caminho: str) -> int:
+    return int(os.path.basename(caminho).split(".")[1])
+
+
+def aplicar_evento(estado: Dict[str, Dict[str, Any]], evento: Dict[str, Any]):
+    """Aplica um evento do diário ao estado em memória (cliente_id -> dados)."""
+    dados = estado.get(evento["c"])
+    if dados is None: dados = estado[evento["c"]] = cliente_novo(evento["c"])
+    for campo, chave in _CAMPOS_CLIENTE.items():
+        if chave in evento: dados[campo] = evento[chave]
+    posicoes = dados["carteira_investimentos"]
+    for ticker, posicao in evento.get("pos", {}).items():
+        indice = next((i for i, p in enumerate(posicoes) if p["ticker"] == ticker), None)
+        if posicao is None:
+            if indice is not None: posicoes.pop(indice)
+        elif indice is None: posicoes.append(posicao)
+        else: posicoes[indice] = posicao
+
+
+def _evento(operacao: str, original: Dict[str, Any], dados: Dict[str, Any], execucoes: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    evento = {"op": operacao, "c": dados["cliente_id"]}
+    if execucoes: evento["ex"] = execucoes  # a negociação em si; a reconstrução do estado usa só os campos abaixo
+    for campo, chave in _CAMPOS_CLIENTE.items():
+        if original is None or original.get(campo) != dados.get(campo): evento[chave] = dados.get(campo)
+    antigas = {p["ticker"]: p for p in (original or {}).get("carteira_investimentos", [])}
+    novas = {p["ticker"]: p for p in dados["carteira_investimentos"]}
+    alteradas = {t: p for t, p in novas.items() if antigas.get(t) != p}
+    alteradas.update({t: None for t in antigas.keys() - novas.keys()})
+    if alteradas: evento["pos"] = alteradas
+    return evento
+
+
+class ArmazenamentoDiario(Armazenamento):
+    """
+    Backend baseado em um diário de eventos somente-anexação.
+    Cada compra, venda ou mudança de perfil vira uma linha JSON compacta com os
+    campos alterados e as negociações executadas (lado, ticker, quantidade,
+    preço e valor), de onde sai o histórico de operações; gravar é um único append seguido de fsync. O estado atual
+    é reconstruído a partir do último snapshot mais a cauda do diário, lida em
+    streaming. A cada EVENTOS_POR_SNAPSHOT eventos um novo snapshot é gravado e
+    os segmentos anteriores do diário são descartados.
+    """
+
+    def __init__(self, pasta: str = "diario_carteira", eventos_por_snapshot: int = EVENTOS_POR_SNAPSHOT):
+        self.pasta = pasta
+        self.eventos_por_snapshot = eventos_por_snapshot
+        self._lock = threading.RLock()
+        os.makedirs(pasta, exist_ok=True)
+        with self._bloqueio(): self._recuperar()
+
+    @contextmanager
+    def _bloqueio(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.pasta, ".lock"), "a") as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                try: yield
+                finally: fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _recuperar(self):
+        try:
+            with open(os.path.join(self.pasta, ARQUIVO_SNAPSHOT), "r", encoding="utf-8") as f: snapshot = json.load(f)
+        except FileNotFoundError:
+            snapshot = {"segmento": 0, "clientes": {}}
+        self._estado: Dict[str, Dict[str, Any]] = snapshot["clientes"]
+        self._segmento_snapshot = snapshot["segmento"]
+        self._segmento_atual, self._posicao, self._eventos_desde_snapshot = snapshot["segmento"], 0, 0
+        self._reproduzir()
+
+    def _reproduzir(self):
+        """Lê, linha a linha, os eventos gravados depois da última posição conhecida (inclusive por outros processos)."""
+        segmentos = sorted(_numero_segmento(c) for c in glob.glob(os.path.join(self.pasta, "eventos.*.log")))
+        for numero in segmentos:
+            if numero < self._segmento_atual: continue
+            if numero > self._segmento_atual: self._segmento_atual, self._posicao = numero, 0
+            with open(_segmento(self.pasta, numero), "rb") as f:
+                f.seek(self._posicao)
+                for linha in f:
+                    if not linha.endswith(b"\n"): break  # gravação interrompida: descartada abaixo
+                    aplicar_evento(self._estado, json.loads(linha))
+                    self._posicao += len(linha)
+                    self._eventos_desde_snapshot += 1
+        caminho = _segmento(self.pasta, self._segmento_atual)
+        if os.path.exists(caminho) and os.path.getsize(caminho) > self._posicao:
+            os.truncate(caminho, self._posicao)
+
+    def _sincronizar(self):
+        try:
+            with open(os.path.join(self.pasta, ARQUIVO_SNAPSHOT), "r", encoding="utf-8") as f: segmento = json.load(f)["segmento"]
+        except FileNotFoundError:
+            segmento = 0
+        if segmento != self._segmento_snapshot: self._recuperar()  # outro processo compactou o diário
+        else: self._reproduzir()
+
+    def _anexar(self, evento: Dict[str, Any]):
+        linha = (json.dumps(evento, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with open(_segmento(self.pasta, self._segmento_atual), "ab") as f:
+            f.write(linha)
+            f.flush()
+            os.fsync(f.fileno())
+        self._posicao += len(linha)
+        self._eventos_desde_snapshot += 1
+
+    def compactar(self):
+        """Grava um snapshot do estado atual e descarta os segmentos já cobertos por ele."""
+        with self._bloqueio():
+            self._sincronizar()
+            self._compactar()
+
+    def _compactar(self):
+        novo = self._segmento_atual + 1
+        open(_segmento(self.pasta, novo), "ab").close()
+        _gravar_json_atomico(os.path.join(self.pasta, ARQUIVO_SNAPSHOT), {"segmento": novo, "clientes": self._estado})
+        for caminho in glob.glob(os.path.join(self.pasta, "eventos.*.log")):
+            if _numero_segmento(caminho) < novo: os.remove(caminho)
+        self._segmento_snapshot, self._segmento_atual, self._posicao, self._eventos_desde_snapshot = novo, novo, 0, 0
+
+    def carregar(self, cliente_id: str) -> Dict[str, Any]:
+        with self._bloqueio():
+            self._sincronizar()
+            dados = self._estado.get(cliente_id)
+            return copy.deepcopy(dados) if dados else cliente_novo(cliente_id)
+
+    def clientes(self) -> List[str]:
+        with self._bloqueio():
+            self._sincronizar()
+            return list(self._estado)
+
+    @contextmanager
+    def transacao(self, cliente_id: str, operacao: str = "ajuste", execucoes: List[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        with self._bloqueio():
+            self._sincronizar()
+            original = self._estado.get(cliente_id)
+            dados = copy.deepcopy(original) if original else cliente_novo(cliente_id)
+            yield dados
+            if dados == original: return
+            evento = _evento(operacao, original, dados, execucoes)
+            self._anexar(evento)
+            aplicar_evento(self._estado, copy.deepcopy(evento))
+            if self._eventos_desde_snapshot >= self.eventos_por_snapshot: self._compactar()
@@ -0,0 +1,68 @@
+import os
+
+import simulador_carteira
+
+# Declarações das ferramentas, prompt e construção do modelo. Ficam fora do app.py
+# para serem montadas uma vez por processo, e não a cada rerun do Streamlit.
+
+NOME_MODELO = "models/gemini-flash-latest"
+
+funcoes_disponiveis = {
+    "consultar_carteira": simulador_carteira.consultar_carteira,
+    "comprar_ativo": simulador_carteira.comprar_ativo,
+    "vender_ativo": simulador_carteira.vender_ativo,
+    "executar_ordens": simulador_carteira.executar_ordens,
+    "obter_perfil_investidor": simulador_carteira.obter_perfil_investidor,
+    "iniciar_questionario_perfil": simulador_carteira.iniciar_questionario_perfil,
+    "responder_questionario_perfil": simulador_carteira.responder_questionario_perfil,
+    "sugerir_investimentos": simulador_carteira.sugerir_investimentos,
+    "avaliar_carteira": simulador_carteira.avaliar_carteira,
+}
+ferramentas_para_ia = [
+    { "function_declarations": [
+        { "name": "consultar_carteira", "description": "Obtém a carteira de investimentos e o saldo em conta do cliente." },
+        { "name": "comprar_ativo", "description": "Executa a compra de um ativo financeiro.", "parameters": { "type": "object", "properties": {"ticker": {"type": "string"}, "valor": {"type": "number"}, "quantidade": {"type": "number"}}, "required": ["ticker"] }},
+        { "name": "vender_ativo", "description": "Executa a venda ou resgate de um ativo financeiro.", "parameters": { "type": "object", "properties": {"ticker": {"type": "string"}, "valor": {"type": "number"}, "quantidade": {"type": "number"}}, "required": ["ticker"] }},
+        { "name": "executar_ordens", "description": "Executa várias compras e vendas de uma vez, numa única operação: ou todas são executadas ou nenhuma. As vendas são processadas antes das compras.", "parameters": { "type": "object", "properties": {"ordens": {"type": "array", "items": {"type": "object", "properties": {"tipo": {"type": "string", "enum": ["compra", "venda"]}, "ticker": {"type": "string"}, "valor": {"type": "number"}, "quantidade": {"type": "number"}}, "required": ["tipo", "ticker"]}}}, "required": ["ordens"] }},
+        { "name": "obter_perfil_investidor", "description": "Verifica o perfil de investidor (suitability) do cliente." },
+        { "name": "iniciar_questionario_perfil", "description": "Apresenta as perguntas para definir o perfil de investidor." },
+        { "name": "responder_questionario_perfil", "description": "Envia as 3 respostas do cliente (A, B ou C) para calcular e definir o perfil.", "parameters": { "type": "object", "properties": {"resposta_1": {"type": "string"}, "resposta_2": {"type": "string"}, "resposta_3": {"type": "string"}}, "required": ["resposta_1", "resposta_2", "resposta_3"] }},
+        { "name": "sugerir_investimentos", "description": "Pede uma página de investimentos adequados ao perfil do cliente, ordenados por diversificação da carteira e acessibilidade do preço. Para ver mais opções, chame novamente passando o 'proximo_cursor' recebido como 'cursor'.", "parameters": { "type": "object", "properties": {"cursor": {"type": "string"}} }},
+        { "name": "avaliar_carteira", "description": "Marca a carteira a mercado pelos preços atuais: valor de mercado, lucro/prejuízo não realizado em relação ao preço médio e alocação por categoria e por perfil." }
+    ]}
+]
+
+# SEU PROMPT DE SISTEMA ORIGINAL, 100% PRESERVADO
+PROMPT_SISTEMA = f"""Você é um assistente virtual do banco BTG Pactual. Profissional, eficiente e seguro.
+Sua principal função é ajudar clientes a consultar suas carteiras e a realizar investimentos de forma transacional e personalizada.
+
+REGRAS DE FLUXO DE CONVERSA:
+1.  **SAUDAÇÃO E INTENÇÃO**: Se o cliente quer 'investir', 'ver opções' ou similar, sua PRIMEIRA ação deve ser chamar a função `obter_perfil_investidor`.
+2.  **FLUXO DE PERFIL (SUITABILITY)**:
+    a.  Se `obter_perfil_investidor` retornar um perfil existente, informe o cliente ("Vi aqui que seu perfil é [Perfil].") e chame `sugerir_investimentos`.
+    b.  Se retornar 'perfil_nao_definido', você DEVE iniciar o questionário. Diga: "Para te ajudar melhor, primeiro precisamos definir seu perfil de investidor. São apenas 3 perguntas rápidas." e em seguida chame `iniciar_questionario_perfil`.
+    c.  Ao receber as perguntas da função, apresente-as TODAS de uma vez para o cliente, de forma clara e numerada, e bem formatada com as alternativas embaixo de cada questão. Instrua o cliente a responder com o número da pergunta e a letra da opção (ex: 'Minhas respostas são 1A, 2B e 3C').
+    d.  Ao receber as 3 respostas, chame a função `responder_questionario_perfil` com os argumentos `resposta_1`, `resposta_2` e `resposta_3`.
+    e.  Após sucesso, informe o novo perfil e chame `sugerir_investimentos`.
+3.  **RECOMENDAÇÃO DE PRODUTOS**:
+    a.  Para saber quais produtos oferecer, SEMPRE use a função `sugerir_investimentos`. Esta é sua única fonte de verdade sobre produtos disponíveis para o perfil do cliente.
+    b.  Ao apresentar as sugestões, mostre o ticker, a descrição e explique por que é adequado.
+4.  **TRANSAÇÕES (COMPRA/VENDA)**:
+    a.  Para Renda Fixa, Fundos e criptomoedas, a operação é por `valor`.
+    b.  Para Renda Variável (ações), a operação é por `quantidade`. Se o cliente fornecer um valor, ajude-o a calcular a quantidade de ações com base no preço retornado pela função de sugestão.
+    c.  Sempre confirme a operação (ativo, valor/quantidade) antes de chamar `comprar_ativo` ou `vender_ativo`.
+
+REGRAS GERAIS:
+-   **PROIBIDO**: Nunca invente um ticker ou produto. Se o cliente pedir algo que não foi retornado por `sugerir_investimentos`, informe que o produto não está disponível para o perfil dele.
+-   Para comprar ou vender mais de um ativo (ex.: rebalancear a carteira), confirme a lista completa de ordens com o cliente e use `executar_ordens` em uma única chamada, em vez de várias chamadas de `comprar_ativo`/`vender_ativo`.
+"""
+
+
+def criar_modelo():
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai.GenerativeModel(
+        model_name=NOME_MODELO,
+        system_instruction=PROMPT_SISTEMA,
+        tools=ferramentas_para_ia
+    )
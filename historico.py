@@ -0,0 +1,160 @@
+import json
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, List, Optional
+
+# Funciona tanto com o histórico do genai.ChatSession (protos) quanto com o do
+# modelo_local.ChatLocal: só usa role, parts e os campos text, function_call,
+# function_response e inline_data de cada parte.
+
+MANTER_TURNOS = 6
+MANTER_RESUMOS = 10  # turnos resumidos mantidos antes de serem descartados de vez
+MARCA_OMITIDOS = "[histórico anterior omitido:"
+LIMITE_RESPOSTA_FUNCAO = 1200  # caracteres de um resultado de ferramenta mantidos nos turnos já concluídos
+LIMITE_TEXTO_RESUMO = 400
+
+
+def para_python(valor: Any) -> Any:
+    """Converte MapComposite/RepeatedComposite (e afins) em dict/list simples."""
+    if isinstance(valor, (str, bytes)): return valor
+    if isinstance(valor, Mapping) or hasattr(valor, "items"): return {k: para_python(v) for k, v in valor.items()}
+    if isinstance(valor, Sequence) or hasattr(valor, "__iter__"): return [para_python(v) for v in valor]
+    return valor
+
+
+def _chamada(parte) -> Optional[Any]:
+    chamada = getattr(parte, "function_call", None)
+    return chamada if chamada is not None and chamada.name else None
+
+
+def _resposta(parte) -> Optional[Any]:
+    resposta = getattr(parte, "function_response", None)
+    return resposta if resposta is not None and resposta.name else None
+
+
+def _audio(parte) -> bool:
+    dados = getattr(parte, "inline_data", None)
+    if dados is None: return False
+    return bool(dados.get("data") if isinstance(dados, Mapping) else dados.data)
+
+
+def parte_para_dict(parte) -> Dict[str, Any]:
+    if _chamada(parte): return {"function_call": {"name": parte.function_call.name, "args": para_python(parte.function_call.args)}}
+    if _resposta(parte): return {"function_response": {"name": parte.function_response.name, "response": para_python(parte.function_response.response)}}
+    if _audio(parte):
+        dados = parte.inline_data
+        return {"inline_data": dict(dados) if isinstance(dados, Mapping) else {"mime_type": dados.mime_type, "data": dados.data}}
+    return {"text": getattr(parte, "text", "") or ""}
+
+
+def tamanho_conteudos(conteudos) -> int:
+    """Tamanho aproximado, em bytes, de uma requisição com estes conteúdos."""
+    total = 0
+    for conteudo in conteudos:
+        for parte in conteudo.parts:
+            if _audio(parte):
+                dados = parte.inline_data
+                total += len(dados.get("data") if isinstance(dados, Mapping) else dados.data)
+            else: total += len(json.dumps(parte_para_dict(parte), ensure_ascii=False).encode("utf-8"))
+    return total
+
+
+def _tamanho_item(item: Any) -> int:
+    if isinstance(item, str): return len(item.encode("utf-8"))
+    if isinstance(item, Mapping) and "data" in item: return len(item["data"])
+    return len(json.dumps(para_python(item), ensure_ascii=False).encode("utf-8"))
+
+
+def resumir_resultado(texto: str, limite: int = LIMITE_RESPOSTA_FUNCAO) -> str:
+    """Resume o JSON devolvido por uma ferramenta: mantém campos curtos e troca listas pela contagem."""
+    if len(texto) <= limite: return texto
+    try: dados = json.loads(texto)
+    except (ValueError, TypeError): return texto[:limite] + f"... [{len(texto)} caracteres omitidos do histórico]"
+    if not isinstance(dados, dict): return f"[{len(dados) if isinstance(dados, list) else 1} itens omitidos do histórico]"
+    resumo = {}
+    for chave, valor in dados.items():
+        if isinstance(valor, list): resumo[chave] = f"[{len(valor)} itens omitidos do histórico]"
+        elif isinstance(valor, dict): resumo[chave] = f"[objeto com {len(valor)} campos omitido do histórico]"
+        elif isinstance(valor, str) and len(valor) > 200: resumo[chave] = valor[:200] + "..."
+        else: resumo[chave] = valor
+    return json.dumps(resumo, ensure_ascii=False)
+
+
+def _texto(conteudo) -> str:
+    return "".join(getattr(p, "text", "") or "" for p in conteudo.parts if not _chamada(p) and not _resposta(p))
+
+
+def _inicia_turno(conteudo) -> bool:
+    return conteudo.role == "user" and not any(_resposta(p) for p in conteudo.parts)
+
+
+class GerenciadorHistorico:
+    """
+    Mantém o histórico enviado ao modelo com tamanho limitado.
+    Os últimos `manter_turnos` turnos ficam literais; turnos mais antigos viram
+    um par pergunta/resposta em texto com a lista de ferramentas usadas, e além
+    de `manter_resumos` resumos os turnos são descartados, restando só a
+    contagem. Áudios de turnos concluídos são trocados por uma marcação e,
+    exceto no turno mais recente, resultados grandes de ferramentas são resumidos.
+    Registra o tamanho de cada requisição de início de turno em `tamanhos`.
+    """
+
+    def __init__(self, manter_turnos: int = MANTER_TURNOS, manter_resumos: int = MANTER_RESUMOS, limite_resposta: int = LIMITE_RESPOSTA_FUNCAO):
+        self.manter_turnos = manter_turnos
+        self.manter_resumos = manter_resumos
+        self.limite_resposta = limite_resposta
+        self.turnos_omitidos = 0
+        self.tamanhos: List[int] = []
+
+    def _turnos(self, historico) -> List[List[Any]]:
+        turnos: List[List[Any]] = []
+        for conteudo in historico:
+            if _inicia_turno(conteudo) or not turnos: turnos.append([])
+            turnos[-1].append(conteudo)
+        return turnos
+
+    def _resumir_turno(self, turno: List[Any]) -> List[Dict[str, Any]]:
+        pergunta = _texto(turno[0])[:LIMITE_TEXTO_RESUMO] or "[mensagem sem texto]"
+        if any(_audio(p) for p in turno[0].parts): pergunta += " [comando de voz]"
+        ferramentas = [c.name for conteudo in turno for c in map(_chamada, conteudo.parts) if c]
+        respostas = [_texto(c) for c in turno[1:] if c.role == "model" and _texto(c)]
+        resposta = (respostas[-1] if respostas else "")[:LIMITE_TEXTO_RESUMO]
+        if ferramentas: resposta += f" (ferramentas usadas: {', '.join(dict.fromkeys(ferramentas))})"
+        return [{"role": "user", "parts": [{"text": pergunta}]}, {"role": "model", "parts": [{"text": resposta or "[sem resposta]"}]}]
+
+    def _enxugar_turno(self, turno: List[Any], resumir_respostas: bool = True) -> List[Dict[str, Any]]:
+        conteudos = []
+        for conteudo in turno:
+            partes = []
+            for parte in conteudo.parts:
+                if _audio(parte): partes.append({"text": "[comando de voz já processado]"})
+                elif _resposta(parte) and resumir_respostas:
+                    resposta = para_python(parte.function_response.response)
+                    if isinstance(resposta.get("result"), str): resposta["result"] = resumir_resultado(resposta["result"], self.limite_resposta)
+                    partes.append({"function_response": {"name": parte.function_response.name, "response": resposta}})
+                else: partes.append(parte_para_dict(parte))
+            conteudos.append({"role": conteudo.role, "parts": partes})
+        return conteudos
+
+    def compactar(self, chat, proxima_mensagem: Any = None):
+        """Reescreve chat.history antes de um novo turno e registra o tamanho da requisição."""
+        turnos = self._turnos(list(chat.history))
+        if turnos and _texto(turnos[0][0]).startswith(MARCA_OMITIDOS): turnos = turnos[1:]
+        descartar = max(0, len(turnos) - self.manter_turnos - self.manter_resumos)
+        self.turnos_omitidos += descartar
+        turnos = turnos[descartar:]
+        antigos = max(0, len(turnos) - self.manter_turnos)
+        novo: List[Dict[str, Any]] = []
+        if self.turnos_omitidos:
+            novo.append({"role": "user", "parts": [{"text": f"{MARCA_OMITIDOS} {self.turnos_omitidos} turnos]"}]})
+            novo.append({"role": "model", "parts": [{"text": "Entendido."}]})
+        for i, turno in enumerate(turnos):
+            if i < antigos: novo.extend(self._resumir_turno(turno))
+            elif i < len(turnos) - 1: novo.extend(self._enxugar_turno(turno))
+            else: novo.extend(self._enxugar_turno(turno, resumir_respostas=False))
+        chat.history = novo
+        tamanho = tamanho_conteudos(chat.history)
+        if proxima_mensagem is not None:
+            itens = proxima_mensagem if isinstance(proxima_mensagem, (list, tuple)) else [proxima_mensagem]
+            tamanho += sum(_tamanho_item(i) for i in itens)
+        self.tamanhos.append(tamanho)
+        return tamanho
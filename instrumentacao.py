@@ -0,0 +1,168 @@
+import bisect
+import cProfile
+import functools
+import heapq
+import io
+import itertools
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+# Medições de latência em processo: histogramas por etapa (modelo, ferramentas,
+# armazenamento, render), exportáveis em texto Prometheus ou JSON, e captura
+# opcional de cProfile dos turnos mais lentos. Configuração pelo ambiente:
+#   INSTRUMENTACAO=0             desliga as medições
+#   INSTRUMENTACAO_PERFIS=N      guarda o cProfile dos N turnos mais lentos (0 = desligado)
+#   INSTRUMENTACAO_AMOSTRAGEM=F  fração dos turnos perfilados quando INSTRUMENTACAO_PERFIS > 0
+#   INSTRUMENTACAO_PAINEL=1      mostra o painel de diagnóstico na barra lateral do app
+
+# Limites dos baldes em segundos: de 1 µs a ~190 s, crescendo por raiz de 2
+LIMITES_BALDES = tuple(1e-6 * 2 ** (i / 2) for i in range(56))
+PERCENTIS = (50, 90, 99)
+LINHAS_PERFIL = 30
+AMOSTRAGEM_PADRAO = 0.1
+
+
+class Histograma:
+    """Contagens por balde logarítmico; memória constante, percentis interpolados no balde."""
+    __slots__ = ("contagens", "contagem", "soma", "maximo")
+
+    def __init__(self):
+        self.contagens = [0] * (len(LIMITES_BALDES) + 1)
+        self.contagem, self.soma, self.maximo = 0, 0.0, 0.0
+
+    def registrar(self, segundos: float):
+        self.contagens[bisect.bisect_left(LIMITES_BALDES, segundos)] += 1
+        self.contagem += 1
+        self.soma += segundos
+        if segundos > self.maximo: self.maximo = segundos
+
+    def percentil(self, p: float) -> float:
+        if not self.contagem: return 0.0
+        alvo, acumulado = self.contagem * p / 100, 0
+        for i, n in enumerate(self.contagens):
+            if n and acumulado + n >= alvo:
+                inferior = LIMITES_BALDES[i - 1] if i else 0.0
+                superior = LIMITES_BALDES[i] if i < len(LIMITES_BALDES) else self.maximo
+                return min(self.maximo, inferior + (superior - inferior) * (alvo - acumulado) / n)
+            acumulado += n
+        return self.maximo
+
+
+class Registro:
+    """Histogramas nomeados por etapa (ex.: "simulador_carteira.comprar_ativo"), seguros entre threads."""
+
+    def __init__(self, ativo: bool = True, perfis: int = 0, amostragem: float = AMOSTRAGEM_PADRAO):
+        self.ativo = ativo
+        self.perfis = perfis
+        self.amostragem = amostragem
+        self._histogramas: Dict[str, Histograma] = {}
+        self._perfis: List[Any] = []  # heap (duração, seq, texto) com os N turnos perfilados mais lentos
+        self._seq = itertools.count()
+        self._trava = threading.Lock()
+
+    def registrar(self, nome: str, segundos: float):
+        if not self.ativo: return
+        with self._trava:
+            histograma = self._histogramas.get(nome)
+            if histograma is None: histograma = self._histogramas[nome] = Histograma()
+            histograma.registrar(segundos)
+
+    @contextmanager
+    def medir(self, nome: str) -> Iterator[None]:
+        if not self.ativo:
+            yield
+            return
+        inicio = time.perf_counter()
+        try: yield
+        finally: self.registrar(nome, time.perf_counter() - inicio)
+
+    def instrumentar(self, nome: str = None) -> Callable[[Callable], Callable]:
+        """Decorador: mede cada chamada da função em `nome` (padrão: modulo.funcao)."""
+        def decorar(funcao: Callable) -> Callable:
+            rotulo = nome or f"{funcao.__module__}.{funcao.__name__}"
+
+            @functools.wraps(funcao)
+            def medida(*args, **kwargs):
+                if not self.ativo: return funcao(*args, **kwargs)
+                inicio = time.perf_counter()
+                try: return funcao(*args, **kwargs)
+                finally: self.registrar(rotulo, time.perf_counter() - inicio)
+            return medida
+        return decorar
+
+    @contextmanager
+    def turno(self, nome: str = "agente.turno") -> Iterator[None]:
+        """Mede um turno e, se sorteado, perfila-o com cProfile (só a thread que roda o turno)."""
+        perfil = None
+        if self.ativo and self.perfis > 0 and random.random() < self.amostragem:
+            perfil = cProfile.Profile()
+            try: perfil.enable()
+            except ValueError: perfil = None  # já há um profiler ativo nesta thread
+        inicio = time.perf_counter()
+        try: yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            if perfil is not None:
+                perfil.disable()
+                self._guardar_perfil(duracao, perfil)
+            self.registrar(nome, duracao)
+
+    def _guardar_perfil(self, duracao: float, perfil: cProfile.Profile):
+        with self._trava:
+            if len(self._perfis) >= self.perfis and duracao <= self._perfis[0][0]: return
+        saida = io.StringIO()
+        pstats.Stats(perfil, stream=saida).sort_stats("cumulative").print_stats(LINHAS_PERFIL)
+        with self._trava:
+            item = (duracao, next(self._seq), saida.getvalue())
+            if len(self._perfis) < self.perfis: heapq.heappush(self._perfis, item)
+            else: heapq.heappushpop(self._perfis, item)
+
+    def perfis_mais_lentos(self) -> List[Dict[str, Any]]:
+        with self._trava: itens = sorted(self._perfis, reverse=True)
+        return [{"duracao_ms": round(d * 1e3, 3), "perfil": texto} for d, _, texto in itens]
+
+    def resumo(self) -> Dict[str, Dict[str, float]]:
+        """Contagem, soma e percentis (em ms) de cada etapa medida."""
+        with self._trava: histogramas = {nome: h for nome, h in sorted(self._histogramas.items())}
+        resumo = {}
+        for nome, h in histogramas.items():
+            resumo[nome] = {"contagem": h.contagem, "soma_ms": round(h.soma * 1e3, 3),
+                            **{f"p{p}_ms": round(h.percentil(p) * 1e3, 3) for p in PERCENTIS},
+                            "max_ms": round(h.maximo * 1e3, 3)}
+        return resumo
+
+    def prometheus(self, metrica: str = "carteira_duracao_segundos") -> str:
+        """Texto no formato de exposição do Prometheus, um histograma com o rótulo `etapa`."""
+        linhas = [f"# HELP {metrica} Duração das etapas do agente e do simulador.", f"# TYPE {metrica} histogram"]
+        with self._trava: histogramas = [(nome, list(h.contagens), h.contagem, h.soma) for nome, h in sorted(self._histogramas.items())]
+        for nome, contagens, contagem, soma in histogramas:
+            acumulado = 0
+            for limite, n in zip(LIMITES_BALDES, contagens):
+                acumulado += n
+                linhas.append(f'{metrica}_bucket{{etapa="{nome}",le="{limite:.6g}"}} {acumulado}')
+            linhas.append(f'{metrica}_bucket{{etapa="{nome}",le="+Inf"}} {contagem}')
+            linhas.append(f'{metrica}_sum{{etapa="{nome}"}} {soma:.9f}')
+            linhas.append(f'{metrica}_count{{etapa="{nome}"}} {contagem}')
+        return "\n".join(linhas) + "\n"
+
+    def exportar_json(self) -> str:
+        return json.dumps({"metricas": self.resumo(), "perfis": self.perfis_mais_lentos()}, ensure_ascii=False, indent=2)
+
+    def limpar(self):
+        with self._trava:
+            self._histogramas.clear()
+            self._perfis.clear()
+
+
+REGISTRO = Registro(ativo=os.getenv("INSTRUMENTACAO", "1") != "0",
+                    perfis=int(os.getenv("INSTRUMENTACAO_PERFIS", "0") or 0),
+                    amostragem=float(os.getenv("INSTRUMENTACAO_AMOSTRAGEM", AMOSTRAGEM_PADRAO) or AMOSTRAGEM_PADRAO))
+medir = REGISTRO.medir
+registrar = REGISTRO.registrar
+instrumentar = REGISTRO.instrumentar
@@ -0,0 +1,167 @@
+import json
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from historico import tamanho_conteudos
+
+# Modelo local que imita a interface do genai.GenerativeModel/ChatSession usada pelo app,
+# para rodar o agente sem a API do Gemini (benchmarks e execução headless).
+
+FERRAMENTAS_INVESTIR = ("obter_perfil_investidor", "consultar_carteira", "sugerir_investimentos")
+
+
+class ChamadaLocal:
+    def __init__(self, name: str, args: Dict[str, Any] = None):
+        self.name, self.args = name, dict(args or {})
+
+
+class RespostaFuncaoLocal:
+    def __init__(self, name: str, response: Dict[str, Any]):
+        self.name, self.response = name, response
+
+
+class ParteLocal:
+    def __init__(self, text: str = "", function_call: ChamadaLocal = None, function_response: RespostaFuncaoLocal = None, inline_data: Dict[str, Any] = None):
+        self.text = text
+        self.function_call = function_call or ChamadaLocal("")
+        self.function_response = function_response
+        self.inline_data = inline_data
+
+
+class ConteudoLocal:
+    def __init__(self, role: str, parts: List[ParteLocal]):
+        self.role, self.parts = role, parts
+
+
+class _Candidato:
+    def __init__(self, content: ConteudoLocal):
+        self.content = content
+
+
+class RespostaLocal:
+    """Resposta no formato do GenerateContentResponse; iterável em trechos quando stream=True."""
+
+    def __init__(self, partes: List[ParteLocal], trechos: Iterator[ParteLocal] = None):
+        self.candidates = [_Candidato(ConteudoLocal("model", partes))]
+        self._trechos = trechos
+
+    @property
+    def text(self) -> str:
+        return "".join(p.text for p in self.candidates[0].content.parts)
+
+    def __iter__(self):
+        for parte in (self._trechos if self._trechos is not None else self.candidates[0].content.parts):
+            yield RespostaLocal([parte])
+
+
+def converter_parte(item: Any) -> ParteLocal:
+    if isinstance(item, ParteLocal): return item
+    if isinstance(item, str): return ParteLocal(text=item)
+    if "function_response" in item:
+        fr = item["function_response"]
+        return ParteLocal(function_response=RespostaFuncaoLocal(fr["name"], fr["response"]))
+    if "function_call" in item:
+        fc = item["function_call"]
+        return ParteLocal(function_call=ChamadaLocal(fc["name"], fc.get("args")))
+    if "text" in item: return ParteLocal(text=item["text"])
+    return ParteLocal(inline_data=item)
+
+
+def converter_conteudo(conteudo: Any, role: str = "user") -> ConteudoLocal:
+    if isinstance(conteudo, ConteudoLocal): return conteudo
+    if isinstance(conteudo, dict) and "parts" in conteudo:
+        return ConteudoLocal(conteudo.get("role", role), [converter_parte(p) for p in conteudo["parts"]])
+    itens = conteudo if isinstance(conteudo, (list, tuple)) else [conteudo]
+    return ConteudoLocal(role, [converter_parte(p) for p in itens])
+
+
+def roteiro_padrao(historico: Sequence[ConteudoLocal], mensagem: ConteudoLocal) -> List[Any]:
+    """
+    Comportamento roteirizado: um pedido de texto vira chamadas paralelas das
+    ferramentas de consulta; respostas de função viram um texto final resumindo-as.
+    Retorna uma lista de partes (texto ou {"function_call": ...}).
+    """
+    respostas = [p.function_response for p in mensagem.parts if p.function_response]
+    if respostas:
+        nomes = ", ".join(r.name for r in respostas)
+        return [f"Consultei {nomes}. " + " ".join(f"Resultado de {r.name} com {len(json.dumps(r.response))} bytes." for r in respostas) + " Posso ajudar em algo mais?"]
+    return [{"function_call": {"name": nome, "args": {}}} for nome in FERRAMENTAS_INVESTIR]
+
+
+def roteiro_chamadas(historico: Sequence[ConteudoLocal], mensagem: ConteudoLocal) -> List[Any]:
+    """
+    Roteiro para geradores de carga: o texto do usuário é uma lista JSON de
+    {"name", "args"} e o modelo emite exatamente essas chamadas de função;
+    as respostas viram um texto final curto.
+    """
+    respostas = [p.function_response for p in mensagem.parts if p.function_response]
+    if respostas: return [f"Executei {len(respostas)} operações."]
+    texto = "".join(p.text for p in mensagem.parts)
+    try: chamadas = json.loads(texto)
+    except ValueError: return [texto]
+    return [{"function_call": chamada} for chamada in chamadas] or ["Nada a fazer."]
+
+
+class ChatLocal:
+    def __init__(self, modelo: "ModeloLocal", history: List[Any] = None):
+        self.modelo = modelo
+        self.history = history or []
+        self.requisicoes: List[int] = []  # tamanho aproximado, em bytes, de cada requisição enviada
+
+    @property
+    def history(self) -> List[ConteudoLocal]:
+        return self._history
+
+    @history.setter
+    def history(self, history: List[Any]):
+        self._history = [converter_conteudo(c) for c in history]
+
+    def send_message(self, content: Any, stream: bool = False, **_) -> RespostaLocal:
+        mensagem = converter_conteudo(content)
+        self.requisicoes.append(tamanho_conteudos(self.history + [mensagem]))
+        itens = self.modelo.roteiro(self.history, mensagem)
+        partes = [converter_parte(i) for i in itens]
+        self._history.append(mensagem)
+        self._history.append(ConteudoLocal("model", partes))
+        time.sleep(self.modelo.latencia_primeiro_token + self.modelo.latencia_por_mb * self.requisicoes[-1] / 1e6)
+        if not stream:
+            time.sleep(self.modelo.latencia_por_token * sum(len(p.text.split()) for p in partes))
+            return RespostaLocal(partes)
+        return RespostaLocal(partes, self._trechos(partes))
+
+    def _trechos(self, partes: List[ParteLocal]) -> Iterator[ParteLocal]:
+        for parte in partes:
+            if not parte.text:
+                yield parte
+                continue
+            for palavra in parte.text.split(" "):
+                time.sleep(self.modelo.latencia_por_token)
+                yield ParteLocal(text=palavra + " ")
+
+
+class ModeloLocal:
+    """
+    Substituto local do genai.GenerativeModel, com latências simuladas.
+    `latencia_por_mb` simula o envio da requisição; generate_content responde
+    sempre `transcricao` (o modelo usado para transcrever comandos de voz).
+    """
+
+    def __init__(self, roteiro: Callable[[Sequence[ConteudoLocal], ConteudoLocal], List[Any]] = roteiro_padrao,
+                 latencia_primeiro_token: float = 0.2, latencia_por_token: float = 0.005, latencia_por_mb: float = 0.0,
+                 transcricao: str = "Quero ver minha carteira e sugestões de investimento."):
+        self.roteiro = roteiro
+        self.latencia_primeiro_token = latencia_primeiro_token
+        self.latencia_por_token = latencia_por_token
+        self.latencia_por_mb = latencia_por_mb
+        self.transcricao = transcricao
+        self.requisicoes: List[int] = []  # tamanho de cada requisição de generate_content
+
+    def start_chat(self, history: Optional[List[Any]] = None) -> ChatLocal:
+        return ChatLocal(self, history)
+
+    def generate_content(self, conteudo: Any, **_) -> RespostaLocal:
+        self.requisicoes.append(tamanho_conteudos([converter_conteudo(conteudo)]))
+        time.sleep(self.latencia_primeiro_token + self.latencia_por_mb * self.requisicoes[-1] / 1e6
+                   + self.latencia_por_token * len(self.transcricao.split()))
+        return RespostaLocal([ParteLocal(text=self.transcricao)])
+
@@ -0,0 +1,199 @@
+import queue
+import threading
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from catalogo import Catalogo, converter_preco
+
+# Tabela de preços ao vivo: os preços do catálogo são a base e um feed (arquivo
+# de ticks ou fila em processo) aplica atualizações por cima, publicando
+# instantâneos versionados que os leitores usam sem trava.
+
+LOTE_MAXIMO = 10_000  # atualizações aplicadas por instantâneo publicado
+TAMANHO_LEITURA = 1 << 20  # caracteres lidos por bloco do arquivo de ticks
+_INFINITO = float("inf")
+
+Atualizacao = Tuple[str, float]
+
+
+class InstantaneoPrecos(NamedTuple):
+    """Versão imutável da tabela: nenhuma escrita altera um instantâneo já publicado."""
+    versao: int
+    precos: array  # array('d'); NaN quando o preço é inválido
+    colunas: Dict[str, int]  # ticker (maiúsculo) -> posição em `precos`
+
+    def preco(self, ticker: str) -> Optional[float]:
+        coluna = self.colunas.get(ticker.upper())
+        if coluna is None: return None
+        valor = self.precos[coluna]
+        return None if valor != valor else valor
+
+
+class TabelaPrecos:
+    """
+    Preços por ticker num array contíguo, com cópia na escrita.
+    Um único escritor por vez copia o array do instantâneo atual, aplica um lote
+    de atualizações e publica o novo instantâneo trocando uma referência; os
+    leitores pegam `instantaneo` uma vez e leem preços coerentes entre si, sem
+    trava e sem bloquear o escritor. Por causa da cópia, atualize em lotes.
+    """
+
+    def __init__(self, catalogo: Catalogo):
+        self._trava = threading.Lock()
+        self.ignorados = 0  # atualizações de tickers fora do catálogo
+        self.rejeitados = 0  # atualizações com preço zero, negativo, infinito ou NaN
+        self.instantaneo = InstantaneoPrecos(0, array("d"), {})
+        self.recarregar(catalogo)
+
+    def recarregar(self, catalogo: Catalogo) -> int:
+        """Refaz a base a partir do catálogo (novos tickers, preços do arquivo). Atualizações anteriores do feed são descartadas."""
+        versao_catalogo = catalogo.versao
+        colunas: Dict[str, int] = {}
+        precos = array("d")
+        for categoria in catalogo.categorias():
+            for produto in catalogo.por_categoria(categoria):
+                chave = produto.ticker.upper()
+                if chave in colunas: continue
+                colunas[chave] = len(precos)
+                precos.append(float("nan") if produto.preco is None else produto.preco)
+        with self._trava:
+            self.versao_catalogo = versao_catalogo
+            self.instantaneo = InstantaneoPrecos(self.instantaneo.versao + 1, precos, colunas)
+            return self.instantaneo.versao
+
+    def aplicar(self, atualizacoes: Iterable[Atualizacao]) -> int:
+        """
+        Aplica um lote de (ticker, preço) e publica um novo instantâneo. Preços que
+        não são positivos e finitos nunca chegam à avaliação das carteiras: são
+        contados em `rejeitados`. Retorna quantas atualizações foram gravadas.
+        """
+        with self._trava:
+            atual = self.instantaneo
+            precos, colunas, ignorados, rejeitados, gravados = atual.precos[:], atual.colunas, 0, 0, 0
+            for ticker, preco in atualizacoes:
+                coluna = colunas.get(ticker)
+                if coluna is None: coluna = colunas.get(ticker.upper())
+                if coluna is None: ignorados += 1
+                elif not 0.0 < preco < _INFINITO: rejeitados += 1  # também pega NaN
+                else:
+                    precos[coluna] = preco
+                    gravados += 1
+            self.ignorados += ignorados
+            self.rejeitados += rejeitados
+            self.instantaneo = InstantaneoPrecos(atual.versao + 1, precos, colunas)
+            return gravados
+
+    def preco(self, ticker: str) -> Optional[float]:
+        return self.instantaneo.preco(ticker)
+
+
+def _ler_linhas(linhas: List[str]) -> List[Atualizacao]:
+    atualizacoes = []
+    for linha in linhas:
+        ticker, _, valor = linha.strip().partition(";")
+        preco = converter_preco(valor) if valor else None
+        if ticker and preco is not None: atualizacoes.append((ticker, preco))
+    return atualizacoes
+
+
+def converter_tick(item: Any) -> Optional[Atualizacao]:
+    """Valida um tick vindo de fora ((ticker, preço), preço numérico ou texto como '11,5'); None se for inválido."""
+    try: ticker, valor = item
+    except (TypeError, ValueError): return None
+    preco = converter_preco(valor) if valor is not None else None
+    if not isinstance(ticker, str) or not ticker or preco is None: return None
+    return ticker, preco
+
+
+def _ler_bloco(texto: str) -> List[Atualizacao]:
+    """Converte um bloco de linhas `TICKER;PRECO`; o caminho rápido faz split e float em laços de C."""
+    linhas = texto.split()
+    partes = ";".join(linhas).split(";")
+    if len(partes) != 2 * len(linhas): return _ler_linhas(linhas)
+    try: return list(zip(partes[0::2], map(float, partes[1::2])))
+    except ValueError: return _ler_linhas(linhas)  # vírgula decimal ou linha inválida no bloco
+
+
+def ler_ticks(caminho: str, tamanho_leitura: int = TAMANHO_LEITURA) -> Iterator[List[Atualizacao]]:
+    """
+    Lê um arquivo de ticks, uma linha `TICKER;PRECO` por atualização (aceita '0,08'),
+    em blocos de ~`tamanho_leitura` caracteres. Linhas inválidas são puladas.
+    """
+    resto = ""
+    with open(caminho, "r", encoding="utf-8") as f:
+        while True:
+            bloco = f.read(tamanho_leitura)
+            if not bloco: break
+            texto, _, resto = (resto + bloco).rpartition("\n")
+            if texto: yield _ler_bloco(texto)
+    if resto.strip(): yield _ler_bloco(resto)
+
+
+def ingerir_arquivo(tabela: TabelaPrecos, caminho: str, lote_maximo: int = LOTE_MAXIMO) -> int:
+    """Aplica um arquivo de ticks em lotes de até `lote_maximo`. Retorna quantas atualizações foram gravadas na tabela."""
+    total = 0
+    for bloco in ler_ticks(caminho):
+        for inicio in range(0, len(bloco), lote_maximo): total += tabela.aplicar(bloco[inicio:inicio + lote_maximo])
+    return total
+
+
+class IngestorPrecos:
+    """
+    Thread que consome atualizações de uma fila (substituta local de um socket de
+    cotações) e as aplica na tabela. Cada item da fila é um (ticker, preço) ou
+    uma lista deles; tudo o que estiver na fila, até `lote_maximo`, vira um só
+    instantâneo. `None` na fila encerra a thread. Se um lote falhar, ele é
+    reaplicado tick a tick validado: os inválidos são pulados e contados em
+    `invalidas`, e a thread segue consumindo. Preços não positivos ou NaN são
+    recusados pela tabela (`TabelaPrecos.rejeitados`); `aplicadas` conta só o
+    que foi gravado.
+    """
+
+    def __init__(self, tabela: TabelaPrecos, fila: "queue.Queue" = None, lote_maximo: int = LOTE_MAXIMO):
+        self.tabela = tabela
+        self.fila = queue.SimpleQueue() if fila is None else fila
+        self.lote_maximo = lote_maximo
+        self.aplicadas = 0
+        self.invalidas = 0  # ticks descartados por formato inválido
+        self.ultimo_erro: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def publicar(self, ticker: str, preco: float):
+        self.fila.put((ticker, preco))
+
+    def iniciar(self) -> "IngestorPrecos":
+        self._thread = threading.Thread(target=self._rodar, name="ingestor-precos", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self, timeout: float = None):
+        """Aplica o que já está na fila e encerra a thread."""
+        self.fila.put(None)
+        if self._thread is not None: self._thread.join(timeout)
+
+    def _rodar(self):
+        ativo = True
+        while ativo:
+            item = self.fila.get()
+            if item is None: break
+            lote = list(item) if isinstance(item, list) else [item]
+            while len(lote) < self.lote_maximo:
+                try: item = self.fila.get_nowait()
+                except queue.Empty: break
+                if item is None:
+                    ativo = False
+                    break
+                if isinstance(item, list): lote.extend(item)
+                else: lote.append(item)
+            self._aplicar(lote)
+
+    def _aplicar(self, lote: List[Any]):
+        try:
+            self.aplicadas += self.tabela.aplicar(lote)  # caminho rápido: a tabela só publica o instantâneo se o lote inteiro for aplicado
+        except Exception:
+            validos = [tick for tick in map(converter_tick, lote) if tick is not None]
+            self.invalidas += len(lote) - len(validos)
+            try: self.aplicadas += self.tabela.aplicar(validos)
+            except Exception as e:
+                self.ultimo_erro = e
+                self.invalidas += len(validos)
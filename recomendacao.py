@@ -0,0 +1,88 @@
+import heapq
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from catalogo import Catalogo, Produto
+
+PESO_DIVERSIFICACAO = 0.6
+PESO_ACESSIBILIDADE = 0.4
+FRACAO_SALDO_POR_ATIVO = 0.1  # um ativo é plenamente acessível se uma unidade custa até 10% do saldo
+TAMANHO_PAGINA = 7
+
+
+class _Candidatos(NamedTuple):
+    produtos: Tuple[Produto, ...]  # ordenados por preço crescente
+    precos: List[float]
+
+
+def _valor_posicao(posicao: Mapping[str, Any]) -> float:
+    if "valor_aplicado" in posicao: return posicao["valor_aplicado"]
+    return posicao.get("quantidade", 0) * posicao.get("preco_medio", 0)
+
+
+def _ler_cursor(cursor: Optional[str], n: int) -> List[int]:
+    if not cursor: return [0] * n
+    try: offsets = [int(x) for x in cursor.split(".")]
+    except ValueError: return [0] * n
+    return offsets if len(offsets) == n and min(offsets, default=0) >= 0 else [0] * n  # cursor vem do modelo: malformado recomeça do início
+
+
+class MotorRecomendacao:
+    """
+    Recomendação por perfil sobre listas de candidatos pré-computadas.
+    Na carga do catálogo cada perfil ganha, por categoria, seus produtos
+    ordenados por preço. Numa consulta, a pontuação combina diversificação
+    (categorias pouco presentes na carteira pontuam mais) e acessibilidade do
+    preço frente ao saldo; como ela só cai com o preço dentro de uma categoria,
+    o ranking é uma intercalação lazy das categorias, sem varrer o catálogo.
+    O cursor guarda quantos itens de cada categoria já foram entregues.
+    """
+
+    def __init__(self, catalogo: Catalogo):
+        self.versao_catalogo = catalogo.versao
+        self.categorias = list(catalogo.categorias())
+        self._candidatos: Dict[str, Dict[str, _Candidatos]] = {}
+        for categoria in self.categorias:
+            por_perfil: Dict[str, List[Produto]] = {}
+            for produto in catalogo.por_categoria(categoria):
+                if produto.preco is None or produto.preco <= 0: continue
+                for perfil in produto.perfil: por_perfil.setdefault(perfil, []).append(produto)
+            for perfil, produtos in por_perfil.items():
+                produtos.sort(key=lambda p: p.preco)
+                self._candidatos.setdefault(perfil, {})[categoria] = _Candidatos(tuple(produtos), [p.preco for p in produtos])
+
+    def _diversificacao(self, carteira: List[Mapping[str, Any]]) -> Dict[str, float]:
+        valores: Dict[str, float] = {}
+        for posicao in carteira: valores[posicao.get("categoria", "")] = valores.get(posicao.get("categoria", ""), 0) + _valor_posicao(posicao)
+        total = sum(valores.values())
+        return {c: 1.0 - (valores.get(c, 0) / total if total else 0.0) for c in self.categorias}
+
+    def recomendar(self, dados: Mapping[str, Any], cursor: str = None, limite: int = TAMANHO_PAGINA) -> Dict[str, Any]:
+        """Uma página de sugestões para o cliente, com o cursor da próxima página (None ao final)."""
+        candidatos = self._candidatos.get(dados.get("perfil_investidor"), {})
+        saldo = dados.get("saldo_conta_corrente", 0)
+        diversificacao = self._diversificacao(dados.get("carteira_investimentos", []))
+        limite_preco = max(0.0, saldo * FRACAO_SALDO_POR_ATIVO)
+        offsets = _ler_cursor(cursor, len(self.categorias))
+
+        def pontuacao(categoria: str, preco: float) -> float:
+            acessibilidade = min(1.0, limite_preco / preco) if preco else 1.0
+            return PESO_DIVERSIFICACAO * diversificacao[categoria] + PESO_ACESSIBILIDADE * acessibilidade
+
+        fila, fins = [], []
+        for i, categoria in enumerate(self.categorias):
+            lista = candidatos.get(categoria)
+            fim = len(lista.precos) if lista else 0  # caros demais para o saldo só pontuam menos (o cliente pode vender para comprar)
+            fins.append(fim)
+            if lista is not None and offsets[i] < fim: fila.append((-pontuacao(categoria, lista.precos[offsets[i]]), i))
+        heapq.heapify(fila)
+        sugestoes = []
+        while fila and len(sugestoes) < limite:
+            negativo, i = heapq.heappop(fila)
+            categoria = self.categorias[i]
+            produto = candidatos[categoria].produtos[offsets[i]]
+            sugestoes.append({"ticker": produto.ticker, "descricao": produto.descricao, "categoria": categoria,
+                              "preco": produto.preco, "pontuacao": round(-negativo, 3)})
+            offsets[i] += 1
+            if offsets[i] < fins[i]: heapq.heappush(fila, (-pontuacao(categoria, candidatos[categoria].precos[offsets[i]]), i))
+        proximo = ".".join(map(str, offsets)) if fila else None
+        return {"sugestoes": sugestoes, "proximo_cursor": proximo}
@@ -0,0 +1,251 @@
+import argparse
+import hashlib
+import importlib
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Serviço de turnos do agente em vários processos. Cada cliente é roteado
+# sempre para o mesmo trabalhador (hash do cliente_id), então as operações de
+# um cliente rodam em série enquanto clientes diferentes rodam em paralelo.
+# Uso: python servico_agente.py --trabalhadores 4 --endereco localhost:6000
+# e, no app, SERVICO_AGENTE=localhost:6000 (a chave vem de SERVICO_AGENTE_CHAVE).
+
+LIMITE_FILA_TRABALHADOR = 64  # turnos aguardando por trabalhador antes de recusar novos
+LIMITE_POR_SESSAO = 2  # turnos pendentes (na fila ou em execução) por sessão
+MAX_SESSOES_POR_TRABALHADOR = 1000  # chats mantidos em memória por trabalhador (LRU)
+ESPERA_FILA = 0.5  # segundos esperando vaga numa fila cheia antes de recusar
+VERIFICAR_TRABALHADOR = 1.0  # intervalo, em segundos, para conferir se o trabalhador de um turno parado ainda vive
+TEMPO_MAXIMO_TURNO = 300.0
+ENDERECO_PADRAO = "localhost:6000"
+BACKENDS_COMPARTILHADOS = ("sqlite", "diario")  # backends que vários processos gravam com segurança e sem reescrever tudo
+
+
+class ServicoOcupado(RuntimeError):
+    """Fila do trabalhador ou limite da sessão atingido: tente novamente em instantes."""
+
+
+def ler_endereco(texto: str) -> Tuple[str, int]:
+    host, _, porta = texto.rpartition(":")
+    return host or "localhost", int(porta)
+
+
+def chave_padrao() -> bytes:
+    """Chave de autenticação das conexões; não há padrão, pois quem conecta com ela pode executar código no serviço (pickle)."""
+    chave = os.getenv("SERVICO_AGENTE_CHAVE")
+    if not chave: raise RuntimeError("Defina SERVICO_AGENTE_CHAVE (ex.: python -c \"import secrets; print(secrets.token_hex(32))\") no serviço e no app.")
+    return chave.encode("utf-8")
+
+
+def verificar_backend() -> str:
+    """Os trabalhadores gravam as carteiras ao mesmo tempo: recusa o carteira.json (e backends desconhecidos)."""
+    backend = (os.getenv("CARTEIRA_BACKEND") or "json").lower()
+    if backend not in BACKENDS_COMPARTILHADOS:
+        raise RuntimeError(f"O serviço do agente usa vários processos: defina CARTEIRA_BACKEND como {' ou '.join(BACKENDS_COMPARTILHADOS)} (atual: {backend}).")
+    return backend
+
+
+def _criar_modelo(fabrica: str, opcoes: Dict[str, Any]):
+    modulo, _, nome = fabrica.partition(":")
+    return getattr(importlib.import_module(modulo), nome)(**(opcoes or {}))
+
+
+def _trabalhador(indice: int, entrada, saida, fabrica: str, opcoes: Dict[str, Any]):
+    """Loop de um processo trabalhador: um turno por vez, com os chats das suas sessões em memória."""
+    import agente
+    import ferramentas
+    from historico import GerenciadorHistorico
+    modelo = _criar_modelo(fabrica, opcoes)
+    sessoes: "OrderedDict[str, Any]" = OrderedDict()
+    saida.put((None, "pronto", indice))
+    while True:
+        pedido = entrada.get()
+        if pedido is None: break
+        id_pedido, sessao_id, cliente_id, conteudo = pedido
+        try:
+            if sessao_id in sessoes: sessoes.move_to_end(sessao_id)
+            else:
+                sessoes[sessao_id] = (modelo.start_chat(history=[]), GerenciadorHistorico())
+                if len(sessoes) > MAX_SESSOES_POR_TRABALHADOR: sessoes.popitem(last=False)
+            chat, historico = sessoes[sessao_id]
+            for trecho in agente.executar_turno(chat, conteudo, ferramentas.funcoes_disponiveis, cliente_id, historico):
+                saida.put((id_pedido, "trecho", trecho))
+            saida.put((id_pedido, "fim", None))
+        except Exception:
+            saida.put((id_pedido, "erro", traceback.format_exc()))
+
+
+class ServicoAgente:
+    """
+    Pool de processos que executa turnos do agente.
+    `enviar` coloca o turno na fila limitada do trabalhador do cliente e devolve
+    um gerador com os trechos da resposta, repassados por uma thread
+    distribuidora. Fila cheia ou sessão com turnos demais geram ServicoOcupado.
+    `fabrica` ("modulo:funcao") cria o modelo dentro de cada trabalhador.
+    """
+
+    def __init__(self, trabalhadores: int = None, fabrica: str = "ferramentas:criar_modelo", opcoes_modelo: Dict[str, Any] = None,
+                 limite_fila: int = LIMITE_FILA_TRABALHADOR, limite_por_sessao: int = LIMITE_POR_SESSAO, contexto: str = "spawn"):
+        verificar_backend()
+        ctx = multiprocessing.get_context(contexto)
+        self.limite_por_sessao = limite_por_sessao
+        self._saida = ctx.Queue()
+        self._entradas = [ctx.Queue(maxsize=limite_fila) for _ in range(trabalhadores or os.cpu_count() or 1)]
+        self._processos = [ctx.Process(target=_trabalhador, args=(i, entrada, self._saida, fabrica, opcoes_modelo), name=f"agente-{i}", daemon=True)
+                           for i, entrada in enumerate(self._entradas)]
+        self._pendentes: Dict[int, "queue.SimpleQueue"] = {}
+        self._por_sessao: Dict[str, int] = {}
+        self._ids = itertools.count()
+        self._trava = threading.Lock()
+        self._prontos, self._todos_prontos = 0, threading.Event()
+        for processo in self._processos: processo.start()
+        self._distribuidor = threading.Thread(target=self._distribuir, name="distribuidor-agente", daemon=True)
+        self._distribuidor.start()
+
+    @property
+    def trabalhadores(self) -> int:
+        return len(self._entradas)
+
+    def trabalhador_de(self, cliente_id: str) -> int:
+        # blake2b e não crc32: ids parecidos (CLIENTE-0001, CLIENTE-0002...) se espalham por igual entre os trabalhadores
+        resumo = hashlib.blake2b(cliente_id.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(resumo, "little") % len(self._entradas)
+
+    def aguardar_prontos(self, timeout: float = None) -> bool:
+        """Espera todos os trabalhadores terminarem de importar módulos e criar o modelo."""
+        return self._todos_prontos.wait(timeout)
+
+    def _distribuir(self):
+        while True:
+            item = self._saida.get()
+            if item is None: break
+            id_pedido, tipo, valor = item
+            if tipo == "pronto":
+                self._prontos += 1
+                if self._prontos == len(self._processos): self._todos_prontos.set()
+                continue
+            respostas = self._pendentes.get(id_pedido)
+            if respostas is not None: respostas.put((tipo, valor))  # sem destino: o chamador desistiu do turno
+
+    def _concluir(self, id_pedido: int, sessao_id: str):
+        with self._trava:
+            self._pendentes.pop(id_pedido, None)
+            restantes = self._por_sessao.get(sessao_id, 1) - 1
+            if restantes > 0: self._por_sessao[sessao_id] = restantes
+            else: self._por_sessao.pop(sessao_id, None)
+
+    def enviar(self, sessao_id: str, cliente_id: str, conteudo: List[Any]) -> Iterator[str]:
+        """Enfileira um turno e devolve o gerador da resposta. Levanta ServicoOcupado na hora, sem enfileirar, se não houver vaga."""
+        with self._trava:
+            if self._por_sessao.get(sessao_id, 0) >= self.limite_por_sessao:
+                raise ServicoOcupado(f"A sessão já tem {self.limite_por_sessao} turnos em andamento.")
+            self._por_sessao[sessao_id] = self._por_sessao.get(sessao_id, 0) + 1
+            id_pedido = next(self._ids)
+            respostas = self._pendentes[id_pedido] = queue.SimpleQueue()
+        indice = self.trabalhador_de(cliente_id)
+        try: self._entradas[indice].put((id_pedido, sessao_id, cliente_id, conteudo), timeout=ESPERA_FILA)
+        except queue.Full:
+            self._concluir(id_pedido, sessao_id)
+            raise ServicoOcupado("Todos os turnos deste trabalhador estão ocupados.")
+        return self._respostas(id_pedido, sessao_id, respostas, self._processos[indice])
+
+    def _respostas(self, id_pedido: int, sessao_id: str, respostas: "queue.SimpleQueue", processo) -> Iterator[str]:
+        limite = time.monotonic() + TEMPO_MAXIMO_TURNO
+        try:
+            while True:
+                try: tipo, valor = respostas.get(timeout=VERIFICAR_TRABALHADOR)
+                except queue.Empty:
+                    if not processo.is_alive(): raise RuntimeError(f"O trabalhador {processo.name} encerrou com código {processo.exitcode}.")
+                    if time.monotonic() > limite: raise TimeoutError(f"Turno sem resposta em {TEMPO_MAXIMO_TURNO:.0f} s.")
+                    continue
+                if tipo == "trecho": yield valor
+                elif tipo == "fim": return
+                else: raise RuntimeError(f"Erro no trabalhador:\n{valor}")
+        finally:
+            self._concluir(id_pedido, sessao_id)
+
+    def encerrar(self, timeout: float = 10.0):
+        for entrada, processo in zip(self._entradas, self._processos):
+            try: entrada.put(None, timeout=ESPERA_FILA)
+            except queue.Full: processo.terminate()  # fila cheia de turnos que não serão mais atendidos
+        for processo in self._processos:
+            processo.join(timeout)
+            if processo.is_alive(): processo.terminate()
+        self._saida.put(None)
+        self._distribuidor.join(timeout)
+
+    def __enter__(self) -> "ServicoAgente":
+        return self
+
+    def __exit__(self, *_):
+        self.encerrar()
+
+
+def _atender(servico: ServicoAgente, conexao):
+    with conexao:
+        try:
+            sessao_id, cliente_id, conteudo = conexao.recv()
+            for trecho in servico.enviar(sessao_id, cliente_id, conteudo): conexao.send(("trecho", trecho))
+            conexao.send(("fim", None))
+        except (EOFError, OSError):
+            pass  # o cliente desconectou
+        except ServicoOcupado as e:
+            conexao.send(("ocupado", str(e)))
+        except Exception:
+            conexao.send(("erro", traceback.format_exc()))
+
+
+def servir(servico: ServicoAgente, endereco: Tuple[str, int], chave: bytes = None):
+    """Porta de entrada para clientes finos (ex.: app.py com SERVICO_AGENTE): uma conexão por turno."""
+    with Listener(endereco, authkey=chave or chave_padrao()) as ouvinte:
+        while True:
+            try: conexao = ouvinte.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError): continue
+            threading.Thread(target=_atender, args=(servico, conexao), daemon=True).start()
+
+
+class ClienteServico:
+    """Cliente fino do ServicoAgente: mesma interface de `enviar`, via multiprocessing.connection."""
+
+    def __init__(self, endereco: str = ENDERECO_PADRAO, chave: bytes = None):
+        self.endereco = ler_endereco(endereco)
+        self.chave = chave or chave_padrao()
+
+    def enviar(self, sessao_id: str, cliente_id: str, conteudo: List[Any]) -> Iterator[str]:
+        conexao = Client(self.endereco, authkey=self.chave)
+        conexao.send((sessao_id, cliente_id, conteudo))
+        return self._respostas(conexao)
+
+    def _respostas(self, conexao) -> Iterator[str]:
+        with conexao:
+            while True:
+                tipo, valor = conexao.recv()
+                if tipo == "trecho": yield valor
+                elif tipo == "fim": return
+                elif tipo == "ocupado": raise ServicoOcupado(valor)
+                else: raise RuntimeError(f"Erro no serviço do agente:\n{valor}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()  # antes dos trabalhadores, que herdam o ambiente (GOOGLE_API_KEY, CARTEIRA_BACKEND)
+    parser = argparse.ArgumentParser(description="Serviço de turnos do agente em vários processos.")
+    parser.add_argument("--trabalhadores", type=int, default=os.cpu_count())
+    parser.add_argument("--endereco", default=os.getenv("SERVICO_AGENTE", ENDERECO_PADRAO))
+    args = parser.parse_args()
+    try:
+        chave = chave_padrao()
+        verificar_backend()
+    except RuntimeError as e: raise SystemExit(str(e))
+    with ServicoAgente(args.trabalhadores) as servico:
+        servico.aguardar_prontos()
+        print(f"Serviço do agente com {servico.trabalhadores} trabalhadores em {args.endereco}")
+        try: servir(servico, ler_endereco(args.endereco), chave)
+        except KeyboardInterrupt: pass
@@ -1,164 +1,263 @@
 import json
-from typing import Dict, Any, List
-
-CARTEIRA_FILE = "carteira.json"
-
-with open("catalogo_final.json", "r", encoding="utf-8") as f: ativos = json.load(f)
-with open("catalogo_cripto.json", "r", encoding="utf-8") as f: cripto = json.load(f)
-
-PRODUTOS_VALIDOS = {
-    "renda_fixa": [
-        {"ticker": "CDB_BTG_DI", "descricao": "CDB Pós-Fixado BTG 105% CDI.", "perfil": ["Conservador", "Moderado"]},
-        {"ticker": "LCI_BTG_360", "descricao": "LCI BTG 1 ano 98% CDI.", "perfil": ["Conservador", "Moderado"]},
-        {"ticker": "TESOURO_SELIC_2029", "descricao": "Tesouro Selic 2029.", "perfil": ["Conservador"]},
-    ],
-    "fundos": [
-        {"ticker": "FUNDO_RF_BTG", "descricao": "Fundo de Renda Fixa BTG.", "perfil": ["Conservador", "Moderado"]},
-        {"ticker": "FUNDO_MM_BTG", "descricao": "Fundo Multimercado BTG.", "perfil": ["Moderado", "Arrojado"]},
-        {"ticker": "FUNDO_ACOES_BTG_ABSOLUTO", "descricao": "Fundo de Ações BTG Pactual Absoluto.", "perfil": ["Arrojado"]},
-    ],
-    "renda_variavel": ativos,
-    "criptomoedas": cripto
-}
-for categoria in ["renda_variavel", "criptomoedas"]:
-    for ativo in PRODUTOS_VALIDOS[categoria]:
-        if "perfil" not in ativo: ativo["perfil"] = ["Arrojado"]
-
-def _carregar_dados() -> Dict[str, Any]:
-    try:
-        with open(CARTEIRA_FILE, 'r', encoding='utf-8') as f: return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"cliente_id": "BTG-78901", "nome_cliente": "Ana Silva", "perfil_investidor": None, "saldo_conta_corrente": 20000.0, "carteira_investimentos": []}
+import threading
+from typing import Dict, Any, List, Mapping, Optional
+
+from armazenamento import CLIENTE_PADRAO, criar_armazenamento
+from carteira import Carteira, Posicao, para_centavos, para_reais
+from catalogo import Catalogo, Produto, CATEGORIAS_VARIAVEIS
+from instrumentacao import instrumentar
+from precos import IngestorPrecos, InstantaneoPrecos, TabelaPrecos
+from recomendacao import MotorRecomendacao, TAMANHO_PAGINA
+
+CATALOGO = Catalogo()
+# Backend escolhido por CARTEIRA_BACKEND (json | sqlite | diario | binario); o padrão continua sendo o carteira.json
+ARMAZENAMENTO = criar_armazenamento()
 
+@instrumentar()
+def _carregar_dados(cliente_id: str = CLIENTE_PADRAO) -> Dict[str, Any]:
+    return ARMAZENAMENTO.carregar(cliente_id)
+
+@instrumentar()
 def _salvar_dados(dados: Dict[str, Any]):
-    with open(CARTEIRA_FILE, 'w', encoding='utf-8') as f: json.dump(dados, f, indent=2, ensure_ascii=False)
+    ARMAZENAMENTO.salvar(dados)
 
-def consultar_carteira() -> str:
-    return json.dumps(_carregar_dados())
+@instrumentar()
+def consultar_carteira(cliente_id: str = CLIENTE_PADRAO) -> str:
+    return json.dumps(_carregar_dados(cliente_id))
 
-def _buscar_produto(ticker: str):
-    ticker_upper = ticker.upper()
-    for categoria, produtos in PRODUTOS_VALIDOS.items():
-        for p in produtos:
-            if p["ticker"].upper() == ticker_upper:
-                p['categoria'] = categoria
-                return p
+_AVALIADOR = None  # avaliacao.Avaliador; NumPy só é importado na primeira avaliação
+_MOTOR_RECOMENDACAO: Optional[MotorRecomendacao] = None
+
+def _avaliador():
+    global _AVALIADOR
+    if _AVALIADOR is None or _AVALIADOR.versao_catalogo != CATALOGO.versao:
+        from avaliacao import Avaliador
+        _AVALIADOR = Avaliador(CATALOGO)
+    return _AVALIADOR
+
+def _avaliar(carteiras: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    from avaliacao import avaliar_carteiras
+    avaliador = _avaliador()
+    return avaliar_carteiras(avaliador, carteiras, avaliador.precos_de(_precos()))
+
+@instrumentar()
+def avaliar_carteira(cliente_id: str = CLIENTE_PADRAO) -> str:
+    """Marca a carteira a mercado pelos preços atuais do catálogo: valor, P&L não realizado e alocação."""
+    return json.dumps({"status": "sucesso", **_avaliar([_carregar_dados(cliente_id)])[0]})
+
+def avaliar_clientes(cliente_ids: List[str] = None) -> List[Dict[str, Any]]:
+    """Avaliação em lote; sem cliente_ids, avalia todos os clientes do armazenamento."""
+    ids = ARMAZENAMENTO.clientes() if cliente_ids is None else cliente_ids
+    return _avaliar([_carregar_dados(c) for c in ids])
+
+@instrumentar()
+def _buscar_produto(ticker: str) -> Optional[Produto]:
+    return CATALOGO.buscar(ticker)
+
+# Preços ao vivo: a tabela parte dos preços do catálogo e recebe atualizações do feed (precos.IngestorPrecos)
+_TABELA_PRECOS: Optional[TabelaPrecos] = None
+_TRAVA_PRECOS = threading.Lock()
+
+def _tabela_precos() -> TabelaPrecos:
+    global _TABELA_PRECOS
+    with _TRAVA_PRECOS:
+        if _TABELA_PRECOS is None: _TABELA_PRECOS = TabelaPrecos(CATALOGO)
+        elif _TABELA_PRECOS.versao_catalogo != CATALOGO.versao: _TABELA_PRECOS.recarregar(CATALOGO)
+        return _TABELA_PRECOS
+
+def _precos() -> InstantaneoPrecos:
+    """Instantâneo atual dos preços; uma operação usa um só instantâneo do início ao fim."""
+    return _tabela_precos().instantaneo
+
+def iniciar_feed_precos(fila=None) -> IngestorPrecos:
+    """Inicia a thread que aplica na tabela de preços as atualizações publicadas na fila."""
+    return IngestorPrecos(_tabela_precos(), fila).iniciar()
+
+def _quantidade_inteira(quantidade: Any) -> Optional[int]:
+    """Quantidade de ações/cripto como inteiro (o modelo pode mandar 3.0); None se for fracionária ou inválida."""
+    try: numero = float(quantidade)
+    except (TypeError, ValueError): return None
+    return int(numero) if numero.is_integer() else None
+
+def _erro_montante(valor: Any = None, quantidade: Any = None) -> Optional[str]:
+    """Confere que 'valor' e 'quantidade', quando informados, são números positivos; None se estiverem válidos."""
+    for campo, numero in (("valor", valor), ("quantidade", quantidade)):
+        if numero is None: continue
+        try: numero = float(numero)
+        except (TypeError, ValueError): return f"O campo '{campo}' deve ser um número."
+        if not numero > 0: return f"O campo '{campo}' deve ser maior que zero."
     return None
 
-def comprar_ativo(ticker: str, valor: float = None, quantidade: int = None) -> str:
-    # Sua lógica de compra, que está correta
+def _calcular_compra(ticker: str, valor: float = None, quantidade: int = None, precos: InstantaneoPrecos = None):
+    """Valida a ordem de compra contra o catálogo. Retorna (produto, preço, custo em centavos, quantidade) ou o dict de erro."""
     produto = _buscar_produto(ticker)
-    if not produto: return json.dumps({"status": "erro", "mensagem": f"Ticker '{ticker}' não encontrado."})
-    try: preco_unitario = float(str(produto.get("Preco", "1.0")).replace(",", "."))
-    except: return json.dumps({"status": "erro", "mensagem": f"Preço do ativo '{ticker}' inválido."})
+    if not produto: return {"status": "erro", "mensagem": f"Ticker '{ticker}' não encontrado."}
+    preco_unitario = (precos or _precos()).preco(produto.ticker)
+    if preco_unitario is None: return {"status": "erro", "mensagem": f"Preço do ativo '{ticker}' inválido."}
     custo_total, quantidade_calculada = 0, 0
-    if valor is not None and quantidade is not None: return json.dumps({"status": "erro", "mensagem": "Forneça apenas valor ou quantidade."})
+    if valor is not None and quantidade is not None: return {"status": "erro", "mensagem": "Forneça apenas valor ou quantidade."}
+    erro = _erro_montante(valor, quantidade)
+    if erro: return {"status": "erro", "mensagem": erro}
     if valor is not None:
         custo_total = float(valor)
-        if produto['categoria'] in ['renda_variavel', 'criptomoedas']:
+        if produto.categoria in CATEGORIAS_VARIAVEIS:
             quantidade_calculada = int(valor / preco_unitario) if preco_unitario > 0 else 0
             custo_total = quantidade_calculada * preco_unitario
         else: quantidade_calculada = valor
     elif quantidade is not None:
-        quantidade_calculada = int(quantidade)
+        quantidade_calculada = _quantidade_inteira(quantidade) if produto.categoria in CATEGORIAS_VARIAVEIS else int(quantidade)
+        if quantidade_calculada is None: return {"status": "erro", "mensagem": f"A quantidade de {ticker.upper()} deve ser um número inteiro de unidades."}
         custo_total = quantidade_calculada * preco_unitario
-    else: return json.dumps({"status": "erro", "mensagem": "Informe 'valor' ou 'quantidade'."})
-    if custo_total <= 0: return json.dumps({"status": "erro", "mensagem": "Não foi possível calcular a operação."})
-    dados = _carregar_dados()
-    if dados["saldo_conta_corrente"] < custo_total: return json.dumps({"status": "erro", "mensagem": f"Saldo insuficiente. Saldo: R${dados['saldo_conta_corrente']:.2f}, Custo: R${custo_total:.2f}."})
-    ativo_existente = next((a for a in dados["carteira_investimentos"] if a["ticker"].upper() == ticker.upper()), None)
-    dados["saldo_conta_corrente"] -= custo_total
-    if ativo_existente:
-        if produto['categoria'] in ['renda_variavel', 'criptomoedas']:
-            ativo_existente["quantidade"] = ativo_existente.get("quantidade", 0) + quantidade_calculada
-            ativo_existente["valor_total"] = ativo_existente.get("valor_total", 0) + custo_total
-            if ativo_existente["quantidade"] > 0: ativo_existente["preco_medio"] = ativo_existente["valor_total"] / ativo_existente["quantidade"]
-        else: ativo_existente["valor_aplicado"] = ativo_existente.get("valor_aplicado", 0) + custo_total
+    else: return {"status": "erro", "mensagem": "Informe 'valor' ou 'quantidade'."}
+    custo_centavos = para_centavos(custo_total)
+    if custo_centavos <= 0: return {"status": "erro", "mensagem": "Não foi possível calcular a operação."}
+    return produto, preco_unitario, custo_centavos, quantidade_calculada
+
+def _execucao(lado: str, ticker: str, quantidade: Optional[int], preco: float, centavos: int) -> Dict[str, Any]:
+    """Registro de uma negociação executada, guardado no histórico pelos backends que o mantêm (diario)."""
+    return {"lado": lado, "ticker": ticker.upper(), "quantidade": quantidade, "preco": preco, "valor": para_reais(centavos)}
+
+def _aplicar_compra(carteira: Carteira, ticker: str, valor: float = None, quantidade: int = None, precos: InstantaneoPrecos = None,
+                    execucoes: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Aplica a compra sobre a carteira em memória; em caso de erro, a carteira não é alterada. Registra a negociação em `execucoes`."""
+    calculo = _calcular_compra(ticker, valor, quantidade, precos)
+    if isinstance(calculo, dict): return calculo
+    produto, preco_unitario, custo, quantidade_calculada = calculo
+    if carteira.saldo_centavos < custo: return {"status": "erro", "mensagem": f"Saldo insuficiente. Saldo: R${carteira.saldo:.2f}, Custo: R${para_reais(custo):.2f}."}
+    posicao = carteira.posicao(ticker)
+    carteira.saldo_centavos -= custo
+    if posicao is None:
+        posicao = carteira.adicionar(Posicao.nova(ticker.upper(), produto.descricao, produto.categoria))
+        posicao.centavos = custo
+        if posicao.variavel: posicao.quantidade, posicao.preco_medio = quantidade_calculada, preco_unitario
     else:
-        novo_ativo = {"ticker": ticker.upper(), "descricao": produto["descricao"], "categoria": produto["categoria"]}
-        if produto['categoria'] in ['renda_variavel', 'criptomoedas']:
-            novo_ativo.update({"quantidade": quantidade_calculada, "valor_total": custo_total, "preco_medio": preco_unitario})
-        else: novo_ativo["valor_aplicado"] = custo_total
-        dados["carteira_investimentos"].append(novo_ativo)
-    _salvar_dados(dados)
-    return json.dumps({"status": "sucesso", "mensagem": f"Compra de {ticker.upper()} no valor de R${custo_total:.2f} realizada!", "novo_saldo_cc": f"R${dados['saldo_conta_corrente']:.2f}"})
+        posicao.centavos += custo
+        if posicao.variavel:
+            posicao.quantidade += quantidade_calculada
+            if posicao.quantidade > 0: posicao.preco_medio = para_reais(posicao.centavos) / posicao.quantidade
+    if execucoes is not None: execucoes.append(_execucao("compra", ticker, quantidade_calculada if posicao.variavel else None, preco_unitario, custo))
+    return {"status": "sucesso", "mensagem": f"Compra de {ticker.upper()} no valor de R${para_reais(custo):.2f} realizada!", "novo_saldo_cc": f"R${carteira.saldo:.2f}"}
 
-# --- FUNÇÃO DE VENDA CORRIGIDA E COMPLETA ---
-def vender_ativo(ticker: str, valor: float = None, quantidade: int = None) -> str:
-    """
-    Vende um ativo da carteira, seja por valor ou por quantidade.
-    """
+@instrumentar()
+def comprar_ativo(ticker: str, valor: float = None, quantidade: int = None, cliente_id: str = CLIENTE_PADRAO) -> str:
+    precos = _precos()
+    calculo = _calcular_compra(ticker, valor, quantidade, precos)
+    if isinstance(calculo, dict): return json.dumps(calculo)
+    execucoes: List[Dict[str, Any]] = []
+    with ARMAZENAMENTO.transacao(cliente_id, "compra", execucoes) as dados:
+        carteira = Carteira.de_dados(dados)
+        resultado = _aplicar_compra(carteira, ticker, valor, quantidade, precos, execucoes)
+        if resultado["status"] == "sucesso": carteira.atualizar(dados)
+    return json.dumps(resultado)
+
+def _aplicar_venda(carteira: Carteira, ticker: str, valor: float = None, quantidade: int = None, precos: InstantaneoPrecos = None,
+                   execucoes: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Aplica a venda sobre a carteira em memória; em caso de erro, a carteira não é alterada. Registra a negociação em `execucoes`."""
     if valor is None and quantidade is None:
-        return json.dumps({"status": "erro", "mensagem": "Forneça o 'valor' ou a 'quantidade' a ser vendida."})
+        return {"status": "erro", "mensagem": "Forneça o 'valor' ou a 'quantidade' a ser vendida."}
+    erro = _erro_montante(valor, quantidade)
+    if erro: return {"status": "erro", "mensagem": erro}
 
-    dados = _carregar_dados()
     ticker_upper = ticker.upper()
-    
-    ativo_para_vender = None
-    indice_ativo = -1
-    for i, ativo in enumerate(dados["carteira_investimentos"]):
-        if ativo["ticker"] == ticker_upper:
-            ativo_para_vender = ativo
-            indice_ativo = i
-            break
-
-    if not ativo_para_vender:
-        return json.dumps({"status": "erro", "mensagem": f"Você não possui o ativo '{ticker_upper}' para vender."})
+    posicao = carteira.posicao(ticker)
+    if posicao is None:
+        return {"status": "erro", "mensagem": f"Você não possui o ativo '{ticker_upper}' para vender."}
 
     produto = _buscar_produto(ticker)
-    try:
-        preco_unitario_atual = float(str(produto.get("Preco", "1.0")).replace(",", "."))
-    except (ValueError, TypeError):
-        return json.dumps({"status": "erro", "mensagem": f"Preço atual do ativo '{ticker}' é inválido."})
+    preco_unitario_atual = (precos or _precos()).preco(produto.ticker) if produto else None
+    if preco_unitario_atual is None:
+        return {"status": "erro", "mensagem": f"Preço atual do ativo '{ticker}' é inválido."}
 
-    valor_a_resgatar = 0
-    
     # Lógica de venda
-    if ativo_para_vender['categoria'] in ['renda_variavel', 'criptomoedas']:
-        total_disponivel = ativo_para_vender.get("valor_total", 0)
-        qtd_disponivel = ativo_para_vender.get("quantidade", 0)
-
+    if posicao.variavel:
         if quantidade is not None: # Venda por quantidade
-            if quantidade > qtd_disponivel:
-                return json.dumps({"status": "erro", "mensagem": f"Quantidade insuficiente. Você possui {qtd_disponivel} unidades de {ticker_upper}."})
-            valor_a_resgatar = quantidade * preco_unitario_atual
-            ativo_para_vender["quantidade"] -= quantidade
-            ativo_para_vender["valor_total"] -= valor_a_resgatar
-        elif valor is not None: # Venda por valor
-            if valor > total_disponivel:
-                return json.dumps({"status": "erro", "mensagem": f"Valor de venda excede o total aplicado de R${total_disponivel:.2f} em {ticker_upper}."})
-            qtd_a_vender = int(valor / preco_unitario_atual) if preco_unitario_atual > 0 else 0
-            if qtd_a_vender > qtd_disponivel:
-                qtd_a_vender = qtd_disponivel # Vende tudo
-            
-            valor_a_resgatar = qtd_a_vender * preco_unitario_atual
-            ativo_para_vender["quantidade"] -= qtd_a_vender
-            ativo_para_vender["valor_total"] -= valor_a_resgatar
+            quantidade = _quantidade_inteira(quantidade)
+            if quantidade is None:
+                return {"status": "erro", "mensagem": f"A quantidade de {ticker_upper} deve ser um número inteiro de unidades."}
+            if quantidade > posicao.quantidade:
+                return {"status": "erro", "mensagem": f"Quantidade insuficiente. Você possui {posicao.quantidade} unidades de {ticker_upper}."}
+            qtd_a_vender = quantidade
+        else: # Venda por valor
+            if para_centavos(valor) > posicao.centavos:
+                return {"status": "erro", "mensagem": f"Valor de venda excede o total aplicado de R${para_reais(posicao.centavos):.2f} em {ticker_upper}."}
+            qtd_a_vender = min(int(valor / preco_unitario_atual) if preco_unitario_atual > 0 else 0, posicao.quantidade)
+        resgate = para_centavos(qtd_a_vender * preco_unitario_atual)
+        posicao.quantidade -= qtd_a_vender
+        vendida = qtd_a_vender
 
     else: # Venda para Renda Fixa e Fundos (baseado em valor)
-        total_disponivel = ativo_para_vender.get("valor_aplicado", 0)
         if valor is None:
-            return json.dumps({"status": "erro", "mensagem": f"Para vender {ticker_upper}, você precisa especificar o 'valor'."})
-        if valor > total_disponivel:
-            return json.dumps({"status": "erro", "mensagem": f"Saldo insuficiente. Você possui R${total_disponivel:.2f} em {ticker_upper}."})
-        
-        valor_a_resgatar = valor
-        ativo_para_vender["valor_aplicado"] -= valor_a_resgatar
+            return {"status": "erro", "mensagem": f"Para vender {ticker_upper}, você precisa especificar o 'valor'."}
+        resgate = para_centavos(valor)
+        if resgate > posicao.centavos:
+            return {"status": "erro", "mensagem": f"Saldo insuficiente. Você possui R${para_reais(posicao.centavos):.2f} em {ticker_upper}."}
+        vendida = None
 
     # Atualiza saldo e remove ativo se zerado
-    dados["saldo_conta_corrente"] += valor_a_resgatar
-    
-    if (ativo_para_vender.get("valor_aplicado", 0) < 0.01 and 'valor_aplicado' in ativo_para_vender) or \
-       (ativo_para_vender.get("quantidade", 0) <= 0 and 'quantidade' in ativo_para_vender):
-        dados["carteira_investimentos"].pop(indice_ativo)
-
-    _salvar_dados(dados)
+    posicao.centavos -= resgate
+    carteira.saldo_centavos += resgate
+    if posicao.zerada: carteira.remover(ticker)
+    if execucoes is not None: execucoes.append(_execucao("venda", ticker, vendida, preco_unitario_atual, resgate))
 
-    return json.dumps({
+    return {
         "status": "sucesso",
-        "mensagem": f"Venda de R${valor_a_resgatar:.2f} do ativo '{ticker_upper}' realizada com sucesso!",
-        "novo_saldo_cc": f"R${dados['saldo_conta_corrente']:.2f}"
-    })
+        "mensagem": f"Venda de R${para_reais(resgate):.2f} do ativo '{ticker_upper}' realizada com sucesso!",
+        "novo_saldo_cc": f"R${carteira.saldo:.2f}"
+    }
+
+# --- FUNÇÃO DE VENDA CORRIGIDA E COMPLETA ---
+@instrumentar()
+def vender_ativo(ticker: str, valor: float = None, quantidade: int = None, cliente_id: str = CLIENTE_PADRAO) -> str:
+    """
+    Vende um ativo da carteira, seja por valor ou por quantidade.
+    """
+    if valor is None and quantidade is None:
+        return json.dumps({"status": "erro", "mensagem": "Forneça o 'valor' ou a 'quantidade' a ser vendida."})
+    execucoes: List[Dict[str, Any]] = []
+    with ARMAZENAMENTO.transacao(cliente_id, "venda", execucoes) as dados:
+        carteira = Carteira.de_dados(dados)
+        resultado = _aplicar_venda(carteira, ticker, valor, quantidade, _precos(), execucoes)
+        if resultado["status"] == "sucesso": carteira.atualizar(dados)
+    return json.dumps(resultado)
+
+def _erro_ordem(ordem: Any) -> Optional[str]:
+    """Confere o formato de uma ordem do lote antes de qualquer operação; None se estiver válida."""
+    if not isinstance(ordem, Mapping): return "Cada ordem precisa ser um objeto com 'tipo', 'ticker' e 'valor' ou 'quantidade'."
+    if str(ordem.get("tipo", "")).lower() not in ("compra", "venda") or not ordem.get("ticker"):
+        return "Cada ordem precisa de 'tipo' (compra ou venda) e 'ticker'."
+    return _erro_montante(ordem.get("valor"), ordem.get("quantidade"))
+
+@instrumentar()
+def executar_ordens(ordens: List[Dict[str, Any]], cliente_id: str = CLIENTE_PADRAO) -> str:
+    """
+    Executa um lote de ordens de compra/venda numa única transação da carteira.
+    As vendas são aplicadas antes das compras, para que o resgate financie o
+    rebalanceamento. Se qualquer ordem falhar, nenhuma é aplicada.
+    Cada ordem: {"tipo": "compra" | "venda", "ticker": str, "valor"?: float, "quantidade"?: int}.
+    """
+    if not ordens: return json.dumps({"status": "erro", "mensagem": "Nenhuma ordem informada."})
+    erros = [_erro_ordem(ordem) for ordem in ordens]
+    if any(erros):
+        resultados = [{"ordem": i + 1, "status": "erro", "mensagem": erro} if erro else {"ordem": i + 1, "status": "nao_executada"}
+                      for i, erro in enumerate(erros)]
+        return json.dumps({"status": "erro", "mensagem": "Nenhuma ordem foi executada: corrija as ordens com erro e envie o lote novamente.", "resultados": resultados})
+    resultados: List[Dict[str, Any]] = [{}] * len(ordens)
+    precos = _precos()  # todas as ordens do lote usam os mesmos preços
+    execucoes: List[Dict[str, Any]] = []  # só chegam ao diário se o lote inteiro for gravado
+    with ARMAZENAMENTO.transacao(cliente_id, "ordens", execucoes) as dados:
+        rascunho = Carteira.de_dados(dados)
+        sequencia = sorted(range(len(ordens)), key=lambda i: str(ordens[i].get("tipo", "")).lower() != "venda")
+        for i in sequencia:
+            ordem = ordens[i]
+            tipo, ticker = str(ordem.get("tipo", "")).lower(), ordem.get("ticker")
+            if tipo == "compra": resultado = _aplicar_compra(rascunho, ticker, ordem.get("valor"), ordem.get("quantidade"), precos, execucoes)
+            else: resultado = _aplicar_venda(rascunho, ticker, ordem.get("valor"), ordem.get("quantidade"), precos, execucoes)
+            resultados[i] = {"ordem": i + 1, "tipo": tipo, "ticker": str(ticker).upper(), **resultado}
+        executadas = all(r.get("status") == "sucesso" for r in resultados)
+        if executadas: rascunho.atualizar(dados)
+    if not executadas:
+        return json.dumps({"status": "erro", "mensagem": "Nenhuma ordem foi executada: corrija as ordens com erro e envie o lote novamente.", "resultados": resultados})
+    return json.dumps({"status": "sucesso", "mensagem": f"{len(ordens)} ordens executadas.", "novo_saldo_cc": f"R${dados['saldo_conta_corrente']:.2f}", "resultados": resultados})
 
 QUESTIONARIO_PERFIL = [
     { "id": 1, "pergunta": "Qual é o seu principal objetivo ao investir?", "opcoes": {"A": {"pontos": 1}, "B": {"pontos": 2}, "C": {"pontos": 3}}},
@@ -166,14 +265,17 @@ QUESTIONARIO_PERFIL = [
     { "id": 3, "pergunta": "Como você reagiria se seus investimentos caíssem 20% em um mês?", "opcoes": {"A": {"pontos": 1}, "B": {"pontos": 2}, "C": {"pontos": 3}}},
 ]
 
-def obter_perfil_investidor() -> str:
-    perfil = _carregar_dados().get("perfil_investidor")
+@instrumentar()
+def obter_perfil_investidor(cliente_id: str = CLIENTE_PADRAO) -> str:
+    perfil = _carregar_dados(cliente_id).get("perfil_investidor")
     return json.dumps({"status": "perfil_existente", "perfil": perfil} if perfil else {"status": "perfil_nao_definido"})
 
+@instrumentar()
 def iniciar_questionario_perfil() -> str:
     return json.dumps(QUESTIONARIO_PERFIL)
 
-def responder_questionario_perfil(resposta_1: str, resposta_2: str, resposta_3: str) -> str:
+@instrumentar()
+def responder_questionario_perfil(resposta_1: str, resposta_2: str, resposta_3: str, cliente_id: str = CLIENTE_PADRAO) -> str:
     respostas = {'1': resposta_1, '2': resposta_2, '3': resposta_3}
     pontuacao_total = 0
     try:
@@ -185,18 +287,19 @@ def responder_questionario_perfil(resposta_1: str, resposta_2: str, resposta_3:
     perfil = "Arrojado"
     if pontuacao_total <= 4: perfil = "Conservador"
     elif pontuacao_total <= 7: perfil = "Moderado"
-    dados = _carregar_dados()
-    dados["perfil_investidor"] = perfil
-    _salvar_dados(dados)
+    with ARMAZENAMENTO.transacao(cliente_id, "perfil") as dados: dados["perfil_investidor"] = perfil
     return json.dumps({"status": "sucesso", "mensagem": f"Seu perfil foi definido como: {perfil}.", "perfil": perfil})
 
-def sugerir_investimentos() -> str:
-    dados = _carregar_dados()
+def _motor_recomendacao() -> MotorRecomendacao:
+    global _MOTOR_RECOMENDACAO
+    if _MOTOR_RECOMENDACAO is None or _MOTOR_RECOMENDACAO.versao_catalogo != CATALOGO.versao:
+        _MOTOR_RECOMENDACAO = MotorRecomendacao(CATALOGO)
+    return _MOTOR_RECOMENDACAO
+
+@instrumentar()
+def sugerir_investimentos(cursor: str = None, cliente_id: str = CLIENTE_PADRAO) -> str:
+    dados = _carregar_dados(cliente_id)
     perfil = dados.get("perfil_investidor")
     if not perfil: return json.dumps({"status": "erro", "mensagem": "Perfil não definido."})
-    sugestoes = []
-    for produtos in PRODUTOS_VALIDOS.values():
-        for produto in produtos:
-            if perfil in produto.get("perfil", []):
-                sugestoes.append(produto)
-    return json.dumps({"status": "sucesso", "perfil": perfil, "sugestoes": sugestoes[:7]})
\ No newline at end of file
+    pagina = _motor_recomendacao().recomendar(dados, cursor, TAMANHO_PAGINA)
+    return json.dumps({"status": "sucesso", "perfil": perfil, **pagina})
\ No newline at end of file